@@ -10,6 +10,11 @@ import json
 import sys
 import argparse
 
+# Run directly as a file, so make the repository root importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.helpers.completion_cache import parse_completion
+from scripts.helpers.embeddings import embed_texts
+
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env.local'))
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -48,9 +53,8 @@ def fetch_compliance_text(url):
 
         # clean text and generate title
         openai.api_key = os.getenv("OPENAI_API_KEY")
-        client = openai.OpenAI()
 
-        response = client.beta.chat.completions.parse(
+        result = parse_completion(
             model="gpt-4o-2024-08-06",
             messages=[
                 {"role": "system", "content": "You are a text cleaning assistant."},
@@ -59,13 +63,11 @@ def fetch_compliance_text(url):
             response_format=ComplianceResponse,
         )
 
-        message = response.choices[0].message
-        if message.parsed:
-            result = message.parsed
+        if result:
             print("RESULT", result)
             return result
         else:
-            logging.error("OpenAI API refusal: ", message.refusal)
+            logging.error("OpenAI API refused to clean the text")
             return None
 
     except Exception as e:
@@ -75,11 +77,7 @@ def fetch_compliance_text(url):
 def store_compliance_text(data, url):
     # Create embeddings
     openai.api_key = os.getenv("OPENAI_API_KEY")
-    embeddings_response = openai.embeddings.create(
-        model="text-embedding-3-small",
-        input=data.cleaned_text
-    )
-    embeddings = embeddings_response.data[0].embedding
+    embeddings = embed_texts([data.cleaned_text])[0]
 
     data_to_store = {
         "url": url,
@@ -10,6 +10,10 @@ import requests
 import io
 import json
 
+# Run directly as a file, so make the repository root importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.helpers.embeddings import embed_texts
+
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env.local'))
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -44,11 +48,7 @@ def clean_and_process_text(raw_text):
     return response.choices[0].message.content
 
 def store_compliance_text(data, file_name):
-    embeddings_response = openai.embeddings.create(
-        model="text-embedding-3-small",
-        input=data['cleaned_text']
-    )
-    embeddings = embeddings_response.data[0].embedding
+    embeddings = embed_texts([data['cleaned_text']])[0]
 
     data_to_store = {
         "url": file_name,
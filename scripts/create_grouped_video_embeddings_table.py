@@ -1,16 +1,23 @@
+import argparse
+import asyncio
+from collections import defaultdict
 from datetime import datetime, timezone
+from functools import partial
+from itertools import islice
+import json
 import os
 import sys
 import traceback
-from typing import Any
 import supabase
 from dotenv import load_dotenv
-from uuid import uuid4
+import numpy as np
 import openai
-from multiprocessing import Pool, cpu_count
 
 from tqdm import tqdm
 
+from scripts.helpers.async_openai import run_bounded
+from scripts.helpers.embeddings import embed_texts_async
+
 # Load environment variables
 load_dotenv(".env.local")
 
@@ -28,77 +35,277 @@ def get_supabase_client():
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
 
-def process_video(video_uuid, soundbytes):
-    min_block_len = 10  # seconds
-    max_block_len = 60  # seconds
+# "api" re-embeds each block's text; "local" combines the stored soundbyte vectors
+EMBEDDING_MODES = ("api", "local")
+
+# Sentence-bounded blocks plus fixed windows, tagged in the granularity
+# column so clip search can go from coarse windows down to fine blocks
+SENTENCE_GRANULARITY = "sentence"
+WINDOW_SECONDS = {"window_15": 15, "window_45": 45, "window_120": 120}
+GRANULARITIES = (SENTENCE_GRANULARITY, *WINDOW_SECONDS)
+SENTENCE_MIN_SECONDS = 10
+SENTENCE_MAX_SECONDS = 60
+
+# Videos fetched per RPC call; only one page is held in memory at a time
+VIDEO_PAGE_SIZE = 100
+
+# Pages that include vectors are also capped by soundbytes, since each
+# vector is ~20 KB of JSON. A single longer video still comes back whole
+EMBEDDING_PAGE_SOUNDBYTES = 2000
+INSERT_CHUNK_SIZE = 200
+DELETE_CHUNK_SIZE = 100
+
+
+def iter_videos(supabase_client, include_embeddings=False, page_size=VIDEO_PAGE_SIZE):
+    """Yield each video's soundbytes, fetching keyset-paginated pages by video_uuid."""
+    after_video_uuid = None
+    while True:
+        page = fetch_video_page(
+            supabase_client, after_video_uuid, include_embeddings, page_size
+        )
+        # Pages capped by soundbytes can be short before the end, so only an
+        # empty page means there is nothing left
+        if not page:
+            return
+        yield from page
+        after_video_uuid = page[-1]["video_uuid"]
+
+
+def fetch_video_page(supabase_client, after_video_uuid, include_embeddings, page_size):
+    return (
+        supabase_client.rpc(
+            "get_grouped_video_embeddings_page",
+            {
+                "after_video_uuid": after_video_uuid,
+                "page_size": page_size,
+                "include_embeddings": include_embeddings,
+                "max_soundbytes": EMBEDDING_PAGE_SOUNDBYTES if include_embeddings else None,
+            },
+        )
+        .execute()
+        .data
+    )
+
+
+def replace_video_blocks(supabase_client, blocks, granularities=GRANULARITIES):
+    """Swap a video's stored blocks at the given granularities for new ones.
+
+    New blocks are inserted before the old ones are deleted, so the video
+    keeps its old blocks until the new ones are in place.
+    """
+    video_uuid = blocks[0]["video_uuid"]
+    old_ids = [
+        row["id"]
+        for row in supabase_client.table("grouped_video_embeddings")
+        .select("id")
+        .eq("video_uuid", video_uuid)
+        .in_("granularity", list(granularities))
+        .execute()
+        .data
+    ]
+    for offset in range(0, len(blocks), INSERT_CHUNK_SIZE):
+        supabase_client.table("grouped_video_embeddings").insert(
+            blocks[offset : offset + INSERT_CHUNK_SIZE]
+        ).execute()
+    for offset in range(0, len(old_ids), DELETE_CHUNK_SIZE):
+        supabase_client.table("grouped_video_embeddings").delete().in_(
+            "id", old_ids[offset : offset + DELETE_CHUNK_SIZE]
+        ).execute()
+
+
+def delete_unseen_videos(supabase_client, seen_video_uuids):
+    """Remove the blocks of videos that no longer have any soundbytes."""
+    stale = set()
+    last_id = None
+    page_size = 1000
+    while True:
+        query = (
+            supabase_client.table("grouped_video_embeddings")
+            .select("id, video_uuid")
+            .order("id")
+            .limit(page_size)
+        )
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.execute().data
+        stale.update(
+            row["video_uuid"] for row in page if row["video_uuid"] not in seen_video_uuids
+        )
+        if len(page) < page_size:
+            break
+        last_id = page[-1]["id"]
+
+    stale = list(stale)
+    for offset in range(0, len(stale), DELETE_CHUNK_SIZE):
+        supabase_client.table("grouped_video_embeddings").delete().in_(
+            "video_uuid", stale[offset : offset + DELETE_CHUNK_SIZE]
+        ).execute()
+    return len(stale)
+
+
+def soundbyte_arrays(soundbytes):
+    """Start times, durations (both in seconds) and sentence endings as arrays."""
+    starts = np.array([soundbyte["start_seconds"] for soundbyte in soundbytes], dtype=np.float64)
+    durations = np.array(
+        [soundbyte["duration_seconds"] for soundbyte in soundbytes], dtype=np.float64
+    )
+    ends_sentence = np.array(
+        [bool(soundbyte["text"]) and soundbyte["text"][-1] in ".!?" for soundbyte in soundbytes]
+    )
+    return starts, durations, ends_sentence
+
+
+def to_microseconds(seconds):
+    """Exact integer offsets, so block lengths compare like datetime differences.
+
+    Float sums drift (4.94 + 10 is 14.940000000000001), which would stop a
+    soundbyte exactly 10s after a block's start from closing it.
+    """
+    return np.round(np.asarray(seconds) * 1_000_000).astype(np.int64)
+
+
+def sentence_block_starts(starts, ends_sentence):
+    """First soundbyte and start time of each sentence-bounded block.
+
+    A block closes on the first soundbyte at least 60s after the block's
+    start, or at least 10s after it and ending a sentence. As before, the
+    next block is timed from the soundbyte that closed the previous one.
+    Each block is found with binary searches, so the cost grows with the
+    number of blocks rather than soundbytes.
+    """
+    count = len(starts)
+    micros = to_microseconds(starts)
+    sentence_ends = np.flatnonzero(ends_sentence)
+    block_starts, block_times = [], []
+    first, close = 0, 0
+    while first < count:
+        anchor = micros[close]
+        block_starts.append(first)
+        block_times.append(starts[close])
+        by_length = np.searchsorted(micros, anchor + SENTENCE_MAX_SECONDS * 1_000_000)
+        earliest = max(
+            first, np.searchsorted(micros, anchor + SENTENCE_MIN_SECONDS * 1_000_000)
+        )
+        next_end = np.searchsorted(sentence_ends, earliest)
+        by_sentence = sentence_ends[next_end] if next_end < len(sentence_ends) else count - 1
+        close = min(by_length, by_sentence, count - 1)
+        first = close + 1
+    return np.array(block_starts), np.array(block_times)
+
+
+def window_block_starts(starts, seconds):
+    """First soundbyte and start time of each fixed-length window with soundbytes."""
+    micros = to_microseconds(starts)
+    windows = (micros - micros[0]) // (seconds * 1_000_000)
+    block_starts = np.concatenate(([0], np.flatnonzero(np.diff(windows)) + 1))
+    return block_starts, starts[block_starts]
+
+
+def to_timestamp(seconds):
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).isoformat()
+
+
+def segment_video(video_uuid, soundbytes, granularities=GRANULARITIES):
+    """Segment a video at each requested granularity from one set of timestamp arrays.
 
+    Returns a ``(blocks, block_starts)`` pair per granularity, where
+    ``block_starts`` holds the index of each block's first soundbyte.
+    """
+    starts, durations, ends_sentence = soundbyte_arrays(soundbytes)
+    ids = [soundbyte["id"] for soundbyte in soundbytes]
+    texts = [soundbyte["text"] or "" for soundbyte in soundbytes]
+
+    levels = []
+    for granularity in granularities:
+        if granularity == SENTENCE_GRANULARITY:
+            block_starts, block_times = sentence_block_starts(starts, ends_sentence)
+        else:
+            block_starts, block_times = window_block_starts(
+                starts, WINDOW_SECONDS[granularity]
+            )
+        block_durations = np.add.reduceat(durations, block_starts)
+        block_ends = [*block_starts[1:], len(soundbytes)]
+        blocks = [
+            {
+                "video_uuid": video_uuid,
+                "granularity": granularity,
+                "timestamp": to_timestamp(block_time),
+                "duration": to_timestamp(block_duration),
+                "soundbytes": ids[start:end],
+                "text": " ".join(texts[start:end]),
+            }
+            for start, end, block_time, block_duration in zip(
+                block_starts, block_ends, block_times, block_durations
+            )
+        ]
+        levels.append((blocks, block_starts))
+    return levels
+
+
+def parse_vector(value):
+    """pgvector values arrive as '[0.1,...]' strings through PostgREST."""
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def soundbyte_vectors(soundbytes):
+    """Stack the stored soundbyte vectors with their text-length weights.
+
+    Soundbytes without a vector get weight zero. Returns None when the
+    video has no vectors at all.
+    """
+    vectors = [parse_vector(soundbyte.get("embedding")) for soundbyte in soundbytes]
+    dims = next((len(vector) for vector in vectors if vector), None)
+    if dims is None:
+        return None
+
+    matrix = np.zeros((len(vectors), dims), dtype=np.float32)
+    weights = np.zeros(len(vectors), dtype=np.float32)
+    for idx, (soundbyte, vector) in enumerate(zip(soundbytes, vectors)):
+        if vector:
+            matrix[idx] = vector
+            weights[idx] = len(soundbyte["text"] or "") or 1
+    return matrix * weights[:, None]
+
+
+def aggregate_block_embeddings(weighted_vectors, block_starts):
+    """Combine weighted soundbyte vectors into one unit vector per block.
+
+    Each block gets the text length-weighted mean of its soundbyte vectors,
+    re-normalized, for the whole video in one reduceat. Blocks without any
+    vectors get None.
+    """
+    if weighted_vectors is None:
+        return [None] * len(block_starts)
+    # Blocks are contiguous runs of soundbytes, so each sum is one reduceat segment
+    sums = np.add.reduceat(weighted_vectors, block_starts, axis=0)
+    norms = np.linalg.norm(sums, axis=1)
+    return [
+        (row / norm).tolist() if norm > 0 else None for row, norm in zip(sums, norms)
+    ]
+
+
+async def process_video(row, mode="api", granularities=GRANULARITIES):
+    video_uuid, soundbytes = row["video_uuid"], row["soundbytes"]
     if not soundbytes:
         return []
 
-    final_blocks = []
-    current_block = {
-        "video_uuid": video_uuid,
-        "start_time": datetime.fromisoformat(soundbytes[0]["timestamp"]),
-        "soundbyte_ids": [],
-        "text_parts": [],
-        "duration": 0,
-    }
-
-    # print(
-    #     "Processing video",
-    #     video_uuid,
-    #     len(soundbytes),
-    #     type(soundbytes),
-    #     soundbytes[0].keys(),
-    # )
-
     try:
-        for idx, soundbyte in enumerate(soundbytes):
-            timestamp = datetime.fromisoformat(soundbyte["timestamp"])
-            duration = datetime.fromisoformat(soundbyte["duration"]).timestamp()
-
-            current_block["soundbyte_ids"].append(soundbyte["id"])
-            current_block["text_parts"].append(soundbyte["text"])
-            current_block["duration"] += duration
-
-            block_length = (timestamp - current_block["start_time"]).total_seconds()
-            (datetime.now() - datetime.now())
-
-            if (
-                block_length >= max_block_len
-                or (
-                    block_length >= min_block_len
-                    and soundbyte["text"]
-                    and soundbyte["text"][-1] in ".!?"
-                )
-                or idx == len(soundbytes) - 1
-            ):
-                text = " ".join(current_block["text_parts"])
-                final_blocks.append(
-                    {
-                        "video_uuid": video_uuid,
-                        "timestamp": current_block["start_time"].isoformat(),
-                        "duration": datetime.fromtimestamp(
-                            current_block["duration"], tz=timezone.utc
-                        ).isoformat(),
-                        "soundbytes": current_block["soundbyte_ids"],
-                        "text": text,
-                        "embedding": openai.embeddings.create(
-                            input=text, model="text-embedding-3-small"
-                        )
-                        .data[0]
-                        .embedding,
-                    }
-                )
-
-                if idx != len(soundbytes) - 1:
-                    current_block = {
-                        "video_uuid": video_uuid,
-                        "start_time": timestamp,
-                        "soundbyte_ids": [],
-                        "text_parts": [],
-                        "duration": 0,
-                    }
+        levels = segment_video(video_uuid, soundbytes, granularities)
+        final_blocks = [block for blocks, _ in levels for block in blocks]
+        if mode == "local":
+            weighted_vectors = soundbyte_vectors(soundbytes)
+            embeddings = [
+                embedding
+                for _, block_starts in levels
+                for embedding in aggregate_block_embeddings(weighted_vectors, block_starts)
+            ]
+        else:
+            # One request for every block of the video, across all granularities
+            embeddings = await embed_texts_async(
+                [block["text"] for block in final_blocks]
+            )
+        for block, embedding in zip(final_blocks, embeddings):
+            block["embedding"] = embedding
     except Exception as e:
         print("Error processing video", video_uuid, e)
         traceback.print_exc()
@@ -107,42 +314,133 @@ def process_video(video_uuid, soundbytes):
     return final_blocks
 
 
+async def compare_modes(rows, granularities=GRANULARITIES):
+    """Score local block vectors against API embeddings of the same blocks.
+
+    Reports, per granularity, the per-block cosine similarity and how often
+    a block's API vector has its own local vector as the nearest block of
+    the video.
+    """
+    similarities = defaultdict(list)
+    matches = defaultdict(list)
+    for row in tqdm(rows, desc="Comparing embedding modes"):
+        if not row["soundbytes"]:
+            continue
+        weighted_vectors = soundbyte_vectors(row["soundbytes"])
+        levels = segment_video(row["video_uuid"], row["soundbytes"], granularities)
+        for granularity, (blocks, block_starts) in zip(granularities, levels):
+            local = aggregate_block_embeddings(weighted_vectors, block_starts)
+            api = await embed_texts_async([block["text"] for block in blocks])
+            pairs = [(l, a) for l, a in zip(local, api) if l is not None and a is not None]
+            if not pairs:
+                continue
+            local_matrix = np.array([l for l, _ in pairs], dtype=np.float32)
+            api_matrix = np.array([a for _, a in pairs], dtype=np.float32)
+            # Both sides are unit vectors, so dot products are cosine similarities
+            cross = api_matrix @ local_matrix.T
+            similarities[granularity].append(np.diag(cross))
+            matches[granularity].append(cross.argmax(axis=1) == np.arange(len(pairs)))
+
+    if not similarities:
+        print("No blocks to compare")
+        return
+    print(f"Compared blocks from {len(rows)} videos")
+    for granularity in granularities:
+        if granularity not in similarities:
+            continue
+        level_similarities = np.concatenate(similarities[granularity])
+        level_matches = np.concatenate(matches[granularity])
+        print(
+            f"{granularity} ({len(level_similarities)} blocks): cosine similarity, "
+            f"local vs API: mean {level_similarities.mean():.4f}, "
+            f"p5 {np.percentile(level_similarities, 5):.4f}, "
+            f"min {level_similarities.min():.4f}; "
+            f"nearest-block agreement {level_matches.mean():.2%}"
+        )
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build grouped_video_embeddings from soundbytes.")
+    parser.add_argument(
+        "--mode",
+        choices=EMBEDDING_MODES,
+        default="api",
+        help="Embed block text with the API, or combine the stored soundbyte vectors locally",
+    )
+    parser.add_argument(
+        "--compare",
+        type=int,
+        metavar="N",
+        help="Compare local and API block vectors on N videos instead of building the table",
+    )
+    parser.add_argument(
+        "--granularities",
+        nargs="+",
+        choices=GRANULARITIES,
+        default=list(GRANULARITIES),
+        help="Segmentations to build; others already stored are left alone",
+    )
+    args = parser.parse_args()
+
     supabase_client = get_supabase_client()
 
-    # Clear table
-    print("Clearing grouped_video_embeddings table")
-    dummy = uuid4()
-    supabase_client.table("grouped_video_embeddings").delete().neq(
-        "video_uuid", dummy
-    ).execute()
+    if args.compare:
+        rows = list(
+            islice(
+                iter_videos(
+                    supabase_client,
+                    include_embeddings=True,
+                    page_size=min(args.compare, VIDEO_PAGE_SIZE),
+                ),
+                args.compare,
+            )
+        )
+        asyncio.run(compare_modes(rows, args.granularities))
+        sys.exit()
 
-    # Get all video embeddings, aggregated by video_uuid
-    soundbytes: 'list[dict[str, Any]]' = (
-        supabase_client.rpc("get_grouped_video_embeddings").execute().data
-    )
+    seen_video_uuids = set()
 
-    with tqdm(total=len(soundbytes), desc="Processing videos") as pbar:
+    async def stream_videos():
+        # Local mode needs each soundbyte's vector as well as its text
+        include_embeddings = args.mode == "local"
 
-        def push_to_supabase(blocks):
-            supabase_client = get_supabase_client()
-            chunk_size = 200
-            for offset in range(0, len(blocks), chunk_size):
-                supabase_client.table("grouped_video_embeddings").insert(
-                    blocks[offset : offset + chunk_size]
-                ).execute()
+        def fetch_after(after_video_uuid):
+            # Page RPCs run in a thread so they never stall requests in flight
+            return asyncio.create_task(
+                asyncio.to_thread(
+                    fetch_video_page,
+                    supabase_client,
+                    after_video_uuid,
+                    include_embeddings,
+                    VIDEO_PAGE_SIZE,
+                )
+            )
+
+        next_page = fetch_after(None)
+        while page := await next_page:
+            # Fetch the following page while this one is being processed
+            next_page = fetch_after(page[-1]["video_uuid"])
+            for row in page:
+                seen_video_uuids.add(row["video_uuid"])
+                yield row
 
+    with tqdm(desc="Processing videos", unit="video") as pbar:
+
+        def push_to_supabase(blocks):
+            # A video that failed keeps its previous blocks
+            if blocks:
+                replace_video_blocks(get_supabase_client(), blocks, args.granularities)
             pbar.update(1)
 
-        with Pool() as pool:
-            for row in soundbytes:
-                pool.apply_async(
-                    process_video,
-                    args=(row["video_uuid"], row["soundbytes"]),
-                    callback=push_to_supabase,
-                )
+        asyncio.run(
+            run_bounded(
+                partial(process_video, mode=args.mode, granularities=args.granularities),
+                stream_videos(),
+                push_to_supabase,
+            )
+        )
 
-            pool.close()
-            pool.join()
+    removed = delete_unseen_videos(supabase_client, seen_video_uuids)
+    print(f"Removed blocks of {removed} videos without soundbytes")
 
     print("Done")
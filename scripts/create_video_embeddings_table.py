@@ -1,12 +1,24 @@
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime, timezone
+import argparse
+import asyncio
+import hashlib
 import os
+import sys
 import supabase
 from dotenv import load_dotenv
 from uuid import uuid4
 import openai
-from multiprocessing import Pool, Queue, cpu_count
 from tqdm import tqdm
+from scripts.helpers.async_openai import run_bounded
+from scripts.helpers.batch_writer import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_FLUSH_SECONDS,
+    DEFAULT_WRITERS,
+    BatchWriter,
+)
+from scripts.helpers.embeddings import embed_texts_async, pack_batches
 
 # Load environment variables
 load_dotenv(".env.local")
@@ -24,61 +36,123 @@ def get_supabase_client():
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
 
-def process_video(video_metadata):
-    # print(f"Processing video {video_metadata['video_id']}")
-    supabase_client = get_supabase_client()
-    rows = []
-    for soundbyte in video_metadata["transcript"]:
-        embedding = (
-            openai.embeddings.create(
-                input=soundbyte["text"], model="text-embedding-3-small"
-            )
-            .data[0]
-            .embedding
-        )
-        rows.append(
-            {
-                "video_uuid": video_metadata["id"],
-                "video_id": video_metadata["video_id"],
-                "timestamp": datetime.fromtimestamp(
-                    soundbyte["offset"], tz=timezone.utc
-                ).isoformat(),
-                "duration": datetime.fromtimestamp(
-                    soundbyte["duration"], tz=timezone.utc
-                ).isoformat(),
-                "text": soundbyte["text"],
-                "embedding": embedding,
-            }
-        )
-    # supabase_client.table("video_embeddings").insert(rows).execute()
+def soundbyte_hash(row):
+    """Fingerprint of everything that goes into a soundbyte's stored row."""
+    content = f"{row['timestamp']}|{row['duration']}|{row['text']}"
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def build_rows(video_metadata):
+    rows = [
+        {
+            "video_uuid": video_metadata["id"],
+            "video_id": video_metadata["video_id"],
+            "timestamp": datetime.fromtimestamp(
+                soundbyte["offset"], tz=timezone.utc
+            ).isoformat(),
+            "duration": datetime.fromtimestamp(
+                soundbyte["duration"], tz=timezone.utc
+            ).isoformat(),
+            "text": soundbyte["text"],
+        }
+        for soundbyte in video_metadata["transcript"]
+    ]
+    # Rows are keyed by (video_uuid, content_hash), so repeated soundbytes
+    # are stored once
+    unique_rows = {}
+    for row in rows:
+        row["content_hash"] = soundbyte_hash(row)
+        unique_rows.setdefault(row["content_hash"], row)
+    return list(unique_rows.values())
+
+
+async def embed_rows(rows):
+    """Embed a batch of rows (which may span several videos) in one request."""
+    embeddings = await embed_texts_async([row["text"] for row in rows])
+    for row, embedding in zip(rows, embeddings):
+        row["embedding"] = embedding
     return rows
 
 
-# Queue for insertion operations
-insert_queue = Queue()
-
-
-def db_insert_worker():
-    """Worker function for processing database inserts from a queue."""
-    supabase_client = get_supabase_client()
+def get_existing_hashes(supabase_client):
+    """Map video_uuid -> content_hash -> row ids for every stored soundbyte."""
+    existing = defaultdict(lambda: defaultdict(list))
+    last_id = None
+    page_size = 1000
     while True:
-        item = insert_queue.get()
-        if item is None:  # None is the signal to stop.
-            break
-        for chunk in range(0, len(item), 100):
-            supabase_client.table("video_embeddings").insert(
-                item[chunk : chunk + 100]
-            ).execute()
-        insert_queue.task_done()
+        query = (
+            supabase_client.table("video_embeddings")
+            .select("id, video_uuid, content_hash")
+            .order("id")
+            .limit(page_size)
+        )
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.execute().data
+        for row in page:
+            existing[row["video_uuid"]][row["content_hash"]].append(row["id"])
+        if len(page) < page_size:
+            return existing
+        last_id = page[-1]["id"]
+
+
+def plan_incremental_update(youtube_table, existing):
+    """Work out which soundbytes need embedding and which stored rows are stale.
+
+    Unchanged soundbytes are left alone. Rows whose soundbyte changed or
+    vanished, and every row of a video that is no longer listed, are stale.
+    """
+    rows_to_embed = []
+    stale_ids = []
+    for video_metadata in youtube_table:
+        stored = existing.pop(video_metadata["id"], {})
+        current_hashes = set()
+        for row in build_rows(video_metadata):
+            current_hashes.add(row["content_hash"])
+            if row["content_hash"] not in stored:
+                rows_to_embed.append(row)
+        for content_hash, ids in stored.items():
+            if content_hash not in current_hashes:
+                stale_ids.extend(ids)
+    # Whatever is left belongs to videos that disappeared
+    for stored in existing.values():
+        for ids in stored.values():
+            stale_ids.extend(ids)
+    return rows_to_embed, stale_ids
+
+
+def delete_rows(supabase_client, ids):
+    for chunk in range(0, len(ids), 100):
+        supabase_client.table("video_embeddings").delete().in_(
+            "id", ids[chunk : chunk + 100]
+        ).execute()
 
 
 if __name__ == "__main__":
-    supabase_client = get_supabase_client()
+    parser = argparse.ArgumentParser(description="Embed YouTube transcripts into video_embeddings.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only embed new or changed soundbytes instead of rebuilding the table",
+    )
+    parser.add_argument(
+        "--writers", type=int, default=DEFAULT_WRITERS, help="Threads inserting rows"
+    )
+    parser.add_argument(
+        "--write-batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Rows per insert",
+    )
+    parser.add_argument(
+        "--flush-seconds",
+        type=float,
+        default=DEFAULT_FLUSH_SECONDS,
+        help="Longest a partial batch waits before it is inserted",
+    )
+    args = parser.parse_args()
 
-    # Clear table
-    print("Clearing video_embeddings table")
-    dummy = uuid4()
-    supabase_client.table("video_embeddings").delete().neq("id", dummy).execute()
+    supabase_client = get_supabase_client()
 
     # Get latest unique YouTube videos
     print("Fetching latest unique YouTube videos")
@@ -86,26 +160,56 @@ if __name__ == "__main__":
         supabase_client.rpc("get_latest_unique_youtube_videos").execute().data
     )
 
+    if args.incremental:
+        print("Comparing transcripts with stored soundbytes")
+        rows, stale_ids = plan_incremental_update(
+            youtube_table, get_existing_hashes(supabase_client)
+        )
+        print(f"{len(rows)} new or changed soundbytes, {len(stale_ids)} stale rows")
+    else:
+        # Clear table
+        print("Clearing video_embeddings table")
+        dummy = uuid4()
+        supabase_client.table("video_embeddings").delete().neq("id", dummy).execute()
+        rows = [row for video in youtube_table for row in build_rows(video)]
+        stale_ids = []
+
     # Create a progress bar
-    print("Processing videos")
-    with tqdm(total=len(youtube_table), desc="Processing videos") as pbar:
-
-        def update_progress(rows):
-            # global insert_queue
-            for chunk in range(0, len(rows), 100):
-                supabase_client.table("video_embeddings").insert(
-                    rows[chunk : chunk + 100]
-                ).execute()
-                # insert_queue.put(rows[chunk : chunk + 100])
-            # if rows:
-            #     supabase_client.table("video_embeddings").insert(rows).execute()
-            pbar.update(1)
-
-        with Pool(cpu_count()) as p:
-            for video in youtube_table:
-                p.apply_async(process_video, args=(video,), callback=update_progress)
-
-            p.close()
-            p.join()
+    print("Processing soundbytes")
+    with tqdm(total=len(rows), desc="Writing soundbytes") as pbar:
+        writer = BatchWriter(
+            "video_embeddings",
+            writers=args.writers,
+            batch_size=args.write_batch_size,
+            flush_seconds=args.flush_seconds,
+            on_written=pbar.update,
+            on_conflict="video_uuid,content_hash",
+        )
+
+        # Each task is one embeddings request, packed across videos. Handing
+        # rows to the writer blocks once it falls behind, which holds back
+        # further requests
+        batches = (
+            [rows[i] for i in batch]
+            for batch in pack_batches([row["text"] or "" for row in rows])
+        )
+        try:
+            failed_batches = asyncio.run(run_bounded(embed_rows, batches, writer.put))
+        finally:
+            writer.close()
+
+    # Stale rows go last so videos keep their old rows until replacements
+    # exist. close() raises first if any replacement failed to write, and a
+    # batch that failed to embed never reached the writer, so stop here too
+    if failed_batches:
+        print(
+            f"{failed_batches} embedding batches failed; keeping stale rows."
+            " Rerun with --incremental to retry them"
+        )
+        sys.exit(1)
+
+    if stale_ids:
+        print(f"Deleting {len(stale_ids)} stale rows")
+        delete_rows(supabase_client, stale_ids)
 
     print("All videos processed successfully!")
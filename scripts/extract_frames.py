@@ -1,4 +1,7 @@
 import os
+import sys
+import json
+import hashlib
 import logging
 #pip install git+https://github.com/JuanBindez/pytubefix.git@c0c07b046d8b59574552404931f6ce3c6590137d
 #https://github.com/JuanBindez/pytubefix/commit/c0c07b046d8b59574552404931f6ce3c6590137d
@@ -6,16 +9,20 @@ from pytubefix import YouTube
 from pytubefix.cli import on_progress
 
 from supabase import create_client, Client
-from io import BytesIO
-from uuid import uuid4
+from uuid import UUID, uuid5
 from datetime import datetime, timedelta
+import numpy as np
 import torch
-import torchvision.transforms as transforms
-from PIL import Image
-from torchvision.models import resnet50
+from frame_backends import BACKENDS, DEFAULT_MIN_COSINE, create_backend
 from dotenv import load_dotenv
 import time
 import tempfile
+import argparse
+import multiprocessing as mp
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 
@@ -31,20 +38,122 @@ if not supabase_url or not supabase_key:
 
 supabase: Client = create_client(supabase_url, supabase_key)
 
-# Load a pre-trained ResNet model
-model = resnet50(pretrained=True)
-model.eval()
+# Inference backend for frame embeddings, loaded on first use rather than at import
+embedding_backend = None
 
-# Define a transform to preprocess the frames
-preprocess = transforms.Compose([
-    transforms.Resize(256),
-    transforms.CenterCrop(224),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-])
+# Frames sampled from the first video to calibrate and verify optimized backends
+DEFAULT_CALIBRATION_FRAMES = 64
+CALIBRATION_EVERY_SECONDS = 10
 
-def download_youtube_video(url):
-    logging.info(f"Downloading YouTube video from URL: {url}")
+FEATURE_MODES = ("logits", "penultimate")
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+# Smallest stream height worth downloading; frames are cropped to 224px anyway
+DEFAULT_TARGET_RESOLUTION = 360
+
+# Number of frames run through the model in a single forward pass
+DEFAULT_BATCH_SIZE = 32
+
+# Assumed frame rate when the container does not report one
+DEFAULT_FPS = 30.0
+
+# Sampling gaps at least this long (in seconds) are crossed by seeking rather
+# than grabbing every frame; YouTube keyframes are usually a few seconds apart
+SEEK_MIN_GAP_SECONDS = 5.0
+
+# Decoding may stop this far short of the reported frame count, beyond the
+# sampling step, before the video counts as truncated
+END_OF_VIDEO_SLACK_SECONDS = 2.0
+
+# Threads uploading frames and inserting frame records per video
+DEFAULT_UPLOAD_WORKERS = 8
+
+# Frame records are inserted in bulk once either limit is reached
+FRAME_RECORDS_FLUSH_ROWS = 500
+FRAME_RECORDS_FLUSH_BYTES = 8 * 1024 * 1024
+
+# Namespace for deterministic frames_records ids derived from video and frame number
+FRAME_RECORD_NAMESPACE = UUID("5b0f7c1e-2a8d-4f3b-9a57-0e6c1d2f8b34")
+
+# Local record of the frame keys already uploaded, one file per video
+FRAME_MANIFEST_DIR = os.path.join(os.path.dirname(__file__), ".frame_manifests")
+STORAGE_LIST_PAGE_SIZE = 1000
+
+# Batches between progress checkpoints, and videos fetched per page in incremental mode
+PROGRESS_CHECKPOINT_BATCHES = 10
+VIDEO_PAGE_SIZE = 100
+
+# How often blocked pipeline stages re-check whether they should stop
+QUEUE_POLL_SECONDS = 0.5
+
+# When decoding a file that is still downloading, the decoder stays this far
+# behind the bytes written so it never reads a partly written packet
+DOWNLOAD_LEAD_BYTES = 4 * 1024 * 1024
+DOWNLOAD_POLL_SECONDS = 0.2
+
+# Downscaled sizes used when comparing frames for scene changes
+DHASH_SIZE = 8
+HISTOGRAM_FRAME_SIZE = (64, 36)
+
+
+def configure_torch_threads(num_threads=None):
+    """Set torch's intra-op thread count, defaulting to one thread per core."""
+    num_threads = num_threads or os.cpu_count() or 1
+    torch.set_num_threads(num_threads)
+    logging.info(f"Using {num_threads} torch threads for inference")
+    return num_threads
+
+# ImageNet preprocessing constants (resize shorter side, center crop, normalize)
+RESIZE_SIZE = 256
+CROP_SIZE = 224
+IMAGENET_MEAN = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
+IMAGENET_STD = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
+
+def preprocess_frame(frame):
+    """Resize and center crop a decoded BGR frame into a uint8 RGB array."""
+    height, width = frame.shape[:2]
+    scale = RESIZE_SIZE / min(height, width)
+    resized_width, resized_height = round(width * scale), round(height * scale)
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    resized = cv2.resize(frame, (resized_width, resized_height), interpolation=interpolation)
+
+    top = (resized_height - CROP_SIZE) // 2
+    left = (resized_width - CROP_SIZE) // 2
+    cropped = resized[top:top + CROP_SIZE, left:left + CROP_SIZE]
+    return cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB)
+
+def frames_to_tensor(crops):
+    """Stack uint8 RGB crops into one normalized NCHW float tensor."""
+    batch = torch.from_numpy(np.stack(crops)).permute(0, 3, 1, 2).float().div_(255)
+    return batch.sub_(IMAGENET_MEAN).div_(IMAGENET_STD)
+
+class VideoOpenError(IOError):
+    """OpenCV could not open a video file or stream."""
+
+class TruncatedVideoError(IOError):
+    """Decoding stopped well before the end of the video, e.g. on a stalled stream."""
+
+def resolution_height(stream):
+    return int(stream.resolution.rstrip("p"))
+
+def select_stream(yt, target_resolution=DEFAULT_TARGET_RESOLUTION):
+    """Pick the lowest progressive mp4 stream at or above ``target_resolution``.
+
+    Frames are downscaled to 224px for embedding, so anything larger than the
+    target only costs bandwidth and decode time. Falls back to the highest
+    stream below the target when none reaches it.
+    """
+    candidates = sorted(
+        (stream for stream in yt.streams.filter(progressive=True, file_extension="mp4") if stream.resolution),
+        key=resolution_height,
+    )
+    for stream in candidates:
+        if resolution_height(stream) >= target_resolution:
+            return stream
+    return candidates[-1] if candidates else yt.streams.get_highest_resolution()
+
+def get_youtube_stream(url, target_resolution=DEFAULT_TARGET_RESOLUTION):
+    logging.info(f"Finding stream for YouTube video URL: {url}")
     try:
         yt = YouTube(url, on_progress_callback=on_progress)
         try:
@@ -53,7 +162,7 @@ def download_youtube_video(url):
             logging.error("Failed to access video title.")
             return None
 
-        stream = yt.streams.get_highest_resolution()
+        stream = select_stream(yt, target_resolution)
 
         if stream is None:
             logging.error("No suitable stream found for the video.")
@@ -62,94 +171,615 @@ def download_youtube_video(url):
         print(f"Stream URL: {stream.url}")
         print(f"Stream Resolution: {stream.resolution}")
         print(f"Stream Mime Type: {stream.mime_type}")
+        return stream
+    except Exception as e:
+        logging.error(f"Failed to find a stream for the video: {str(e)}")
+        return None
 
-        video_data = BytesIO()
-        try:
-            stream.stream_to_buffer(video_data)
-        except Exception as e:
-            logging.error(f"Failed to download video: {str(e)}")
-            return None
+class DownloadProgress:
+    """Lets a decoder read a video file while it is still being downloaded.
+
+    Readers wait until the bytes they need, plus ``DOWNLOAD_LEAD_BYTES``,
+    are on disk. Position in the file is estimated from the fraction of
+    frames decoded, so a reader that guesses wrong runs into the end of the
+    written data, which ``decode_frames`` reports as a truncated video.
+    """
 
-        video_data.seek(0)
-        logging.info("Download complete")
-        return video_data
+    def __init__(self, path, total_bytes=None):
+        self.path = path
+        self.total_bytes = total_bytes
+        self.finished = threading.Event()
+
+    def wait_for_bytes(self, count, stop_event=None):
+        while not self.finished.is_set():
+            if stop_event is not None and stop_event.is_set():
+                return
+            try:
+                if os.path.getsize(self.path) >= count:
+                    return
+            except OSError:
+                pass
+            self.finished.wait(DOWNLOAD_POLL_SECONDS)
+
+    def wait_for_fraction(self, fraction, stop_event=None):
+        """Wait until ``fraction`` of the file is on disk, or the whole file if its size is unknown."""
+        if not self.total_bytes:
+            self.wait_for_bytes(float("inf"), stop_event)
+            return
+        needed = min(self.total_bytes, int(fraction * self.total_bytes) + DOWNLOAD_LEAD_BYTES)
+        self.wait_for_bytes(needed, stop_event)
+
+def download_stream_to_file(stream, path=None, progress=None):
+    """Stream a video to a temporary .mp4 file in chunks and return its path.
+
+    Pass ``path`` and ``progress`` to let a decoder read the file as it is
+    written; ``progress`` is marked finished once the download ends.
+    """
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".mp4")
+        os.close(fd)
+    try:
+        stream.download(
+            output_path=os.path.dirname(path), filename=os.path.basename(path), skip_existing=False
+        )
     except Exception as e:
         logging.error(f"Failed to download video: {str(e)}")
+        os.remove(path)
         return None
+    finally:
+        if progress is not None:
+            progress.finished.set()
+    logging.info("Download complete")
+    return path
 
-def generate_embedding(image):
-    logging.info("Generating embedding for the frame")
-    image = preprocess(image)
-    image = image.unsqueeze(0)  # Add batch dimension
-    
-    with torch.no_grad():
-        embedding = model(image)
-    
-    logging.info("Embedding generated")
-    return embedding.squeeze().numpy()
-
-def extract_frames_and_upload(video_id, video_uuid, video_data, interval=1):
-    logging.info(f"Extracting frames from video ID: {video_id}")
+def load_embedding_backend(name="eager", features="logits", calibration_batches=None, min_cosine=DEFAULT_MIN_COSINE):
+    """Build the inference backend used by ``generate_embeddings``."""
+    global embedding_backend
+    embedding_backend = create_backend(name, features, calibration_batches, min_cosine)
+    return embedding_backend
+
+def get_embedding_backend(features="logits"):
+    """Return the loaded backend, loading fp32 eager PyTorch if none was chosen."""
+    if embedding_backend is None:
+        return load_embedding_backend(features=features)
+    if embedding_backend.features != features:
+        raise ValueError(
+            f"Loaded backend produces {embedding_backend.features} features, not {features}"
+        )
+    return embedding_backend
+
+def generate_embeddings(crops, features="logits"):
+    """Embed a list of preprocessed frames with a single forward pass.
+
+    ``features`` selects the 1000-way ImageNet logits or the 2048-d pooled
+    penultimate-layer features.
+    """
+    logging.info(f"Generating embeddings for a batch of {len(crops)} frames")
+    embeddings = get_embedding_backend(features)(frames_to_tensor(crops))
+    logging.info("Embeddings generated")
+    return embeddings
+
+def generate_embedding(frame, features="logits"):
+    return generate_embeddings([preprocess_frame(frame)], features)[0]
+
+def fit_pca(features, dim, path):
+    """Fit a PCA projection to a (num_frames, feature_dim) array and save it."""
+    mean = features.mean(axis=0)
+    _, _, components = np.linalg.svd(features - mean, full_matrices=False)
+    np.savez(path, mean=mean.astype(np.float32), components=components[:dim].astype(np.float32))
+    logging.info(f"Saved {dim}-d PCA projection fitted on {len(features)} frames to {path}")
+
+class FrameEmbeddingFormat:
+    """How raw model outputs become the embeddings stored in frames_records.
+
+    Outputs are optionally projected with a PCA fitted by ``fit_pca``, then
+    optionally L2-normalized, and finally stored as a float32 ``vector``, a
+    float16 ``halfvec`` or per-vector scaled int8 bytes.
+    """
+
+    def __init__(self, features="logits", pca_path=None, normalize=False, dtype="float32"):
+        if features not in FEATURE_MODES:
+            raise ValueError(f"Unknown feature mode: {features}")
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown storage dtype: {dtype}")
+        self.features = features
+        self.normalize = normalize
+        self.dtype = dtype
+        self.pca_mean = self.pca_components = None
+        if pca_path:
+            with np.load(pca_path) as projection:
+                self.pca_mean = projection["mean"]
+                self.pca_components = projection["components"]
+
+    @property
+    def name(self):
+        """Identifies the embedding space, so rows from different formats are never compared."""
+        parts = ["resnet50", self.features]
+        if self.pca_components is not None:
+            parts.append(f"pca{len(self.pca_components)}")
+        if self.normalize:
+            parts.append("l2")
+        parts.append(self.dtype)
+        return "-".join(parts)
+
+    def transform(self, outputs):
+        vectors = outputs.astype(np.float32)
+        if self.pca_components is not None:
+            vectors = (vectors - self.pca_mean) @ self.pca_components.T
+        if self.normalize:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def record_fields(self, vector):
+        fields = {"embedding_model": self.name}
+        if self.dtype == "float32":
+            fields["embedding"] = vector.tolist()
+        elif self.dtype == "float16":
+            fields["embedding_half"] = vector.astype(np.float16).tolist()
+        else:
+            scale = float(np.abs(vector).max()) / 127 or 1.0
+            quantized = np.clip(np.round(vector / scale), -127, 127).astype(np.int8)
+            fields["embedding_int8"] = "\\x" + quantized.tobytes().hex()
+            fields["embedding_scale"] = scale
+        return fields
+
+class FrameRecordBuffer:
+    """Collects a video's frame records and inserts them in bulk.
+
+    Records are flushed once either ``max_rows`` rows or roughly ``max_bytes``
+    bytes of JSON have accumulated; call ``flush`` once more at the end of the
+    video. Safe to share between upload workers.
+    """
+
+    def __init__(self, max_rows=FRAME_RECORDS_FLUSH_ROWS, max_bytes=FRAME_RECORDS_FLUSH_BYTES):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = []
+        self.size = 0
+        self.failed = False
+        self.lock = threading.Lock()
+        # Inserts run one at a time, so a flush returns only once every row
+        # taken before it has been written
+        self.insert_lock = threading.Lock()
+
+    def add(self, record):
+        with self.lock:
+            self.rows.append(record)
+            self.size += len(json.dumps(record))
+            if len(self.rows) < self.max_rows and self.size < self.max_bytes:
+                return
+            rows = self.take()
+        self.insert(rows)
+
+    def flush(self):
+        with self.lock:
+            rows = self.take()
+        self.insert(rows)
+
+    def take(self):
+        rows, self.rows, self.size = self.rows, [], 0
+        return rows
+
+    def insert(self, rows):
+        with self.insert_lock:
+            if not rows:
+                return
+            # Record ids are deterministic, so re-runs overwrite rather than duplicate
+            logging.info(f"Upserting {len(rows)} frame records into database")
+            try:
+                supabase.from_("frames_records").upsert(rows).execute()
+            except Exception:
+                self.failed = True
+                raise
+
+def is_duplicate_upload_error(error):
+    return "Duplicate" in str(error) or "already exists" in str(error)
+
+def upload_if_absent(bucket, path, data, content_type):
+    """Upload to storage, treating an object that already exists as success."""
+    try:
+        supabase.storage.from_(bucket).upload(path, data, {"content-type": content_type})
+        return True
+    except Exception as e:
+        if not is_duplicate_upload_error(e):
+            raise
+        logging.info(f"{bucket}/{path} already exists in storage. Skipping upload.")
+        return False
+
+def frame_storage_path(video_id, jpeg):
+    """Content-addressed storage key for an encoded frame."""
+    return f"{video_id}/{hashlib.sha256(jpeg).hexdigest()}.jpg"
+
+def frame_record_id(video_uuid, frame_number):
+    return str(uuid5(FRAME_RECORD_NAMESPACE, f"{video_uuid}:{frame_number}"))
+
+class UploadedFrames:
+    """Storage keys already uploaded for one video.
+
+    Backed by a local manifest file that is appended to after every upload.
+    When no manifest exists yet it is seeded from a paged listing of the
+    video's folder in the frames bucket, so the existing objects are found
+    without probing each frame individually.
+    """
+
+    def __init__(self, video_id, manifest_dir=FRAME_MANIFEST_DIR):
+        self.video_id = video_id
+        self.path = os.path.join(manifest_dir, f"{video_id}.txt")
+        self.lock = threading.Lock()
+        os.makedirs(manifest_dir, exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path) as manifest:
+                self.keys = {line.strip() for line in manifest if line.strip()}
+        else:
+            self.keys = self.list_bucket()
+            with open(self.path, "w") as manifest:
+                manifest.writelines(f"{key}\n" for key in sorted(self.keys))
+        logging.info(f"{len(self.keys)} frames already uploaded for video ID {video_id}")
+
+    def list_bucket(self):
+        keys = set()
+        offset = 0
+        while True:
+            objects = supabase.storage.from_("frames").list(
+                self.video_id, {"limit": STORAGE_LIST_PAGE_SIZE, "offset": offset}
+            )
+            keys.update(f"{self.video_id}/{item['name']}" for item in objects)
+            if len(objects) < STORAGE_LIST_PAGE_SIZE:
+                return keys
+            offset += STORAGE_LIST_PAGE_SIZE
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.keys
+
+    def add(self, key):
+        with self.lock:
+            if key in self.keys:
+                return
+            self.keys.add(key)
+            with open(self.path, "a") as manifest:
+                manifest.write(f"{key}\n")
+
+def upload_frame_batch(frames, embeddings, record_buffer, uploaded_frames, embedding_format):
+    """Upload stage: store each frame's JPEG and buffer its frame record."""
+    for frame, embedding in zip(frames, embeddings):
+        if frame["storage_path"] in uploaded_frames:
+            logging.info(f"Frame {frame['frame_number']} already uploaded. Skipping upload.")
+        else:
+            # Upload the encoded frame to Supabase storage straight from memory
+            logging.info(f"Uploading frame {frame['frame_number']} to Supabase storage")
+            upload_if_absent("frames", frame["storage_path"], frame["jpeg"], "image/jpeg")
+            uploaded_frames.add(frame["storage_path"])
+
+        record_buffer.add({
+            "id": frame_record_id(frame["video_uuid"], frame["frame_number"]),
+            "video_uuid": frame["video_uuid"],
+            "video_id": frame["video_id"],
+            "frame_number": frame["frame_number"],
+            "storage_path": frame["storage_path"],
+            "created_at": datetime.utcnow().isoformat(),
+            "timestamp": frame["timestamp"],  # Timestamp in ISO 8601 format
+            "end_timestamp": frame["end_timestamp"],  # End of the span this frame represents
+            **embedding_format.record_fields(embedding),  # Store the embedding
+        })
+
+def sampling_step(cap, interval=1, every_seconds=None):
+    """Frame rate of ``cap`` and the number of frames between kept samples."""
+    fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    if every_seconds is not None:
+        return fps, max(1, round(every_seconds * fps))
+    return fps, max(1, interval)
+
+def decoded_to_end(cap, last_sampled, interval=1, every_seconds=None):
+    """Whether sampling that stopped at frame ``last_sampled`` covered the whole video.
+
+    A failed grab looks the same at the end of the file as on a stream
+    read error, so compare against the container's frame count. Videos
+    that don't report one are assumed complete.
+    """
+    frame_total = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    if not frame_total or frame_total <= 0:
+        return True
+    fps, step = sampling_step(cap, interval, every_seconds)
+    last_sampled = last_sampled if last_sampled is not None else -1
+    return frame_total - 1 - last_sampled <= step + END_OF_VIDEO_SLACK_SECONDS * fps
+
+def iter_sampled_frames(cap, interval=1, every_seconds=None, resume_after=None, before_frame=None):
+    """Yield (frame_number, timestamp_ms, frame) for the frames we want to keep.
+
+    With ``every_seconds`` set, one frame is kept per that many seconds of video
+    regardless of fps; otherwise every ``interval``-th frame is kept. Skipped
+    frames are only grabbed (never retrieved and colour-converted), and gaps
+    longer than ``SEEK_MIN_GAP_SECONDS`` are crossed with a seek instead.
+    ``resume_after`` starts sampling at the first sample after that frame.
+    ``before_frame`` is called with each sample's frame number before the
+    frames leading up to it are read.
+    """
+    fps, step = sampling_step(cap, interval, every_seconds)
+    use_seek = step / fps >= SEEK_MIN_GAP_SECONDS
+    logging.info(f"Sampling every {step} frames at {fps:.2f} fps (seek={use_seek})")
+
+    frame_number = 0 if resume_after is None else resume_after + step
+    if before_frame is not None:
+        before_frame(frame_number)
+    if resume_after is not None:
+        logging.info(f"Resuming from frame {frame_number}")
+        if not cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number):
+            for _ in range(frame_number):
+                if not cap.grab():
+                    return
+    while cap.grab():
+        success, frame = cap.retrieve()
+        if not success:
+            break
+        yield frame_number, cap.get(cv2.CAP_PROP_POS_MSEC), frame
+
+        frame_number += step
+        if before_frame is not None:
+            before_frame(frame_number)
+        if use_seek and cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number):
+            continue
+        for _ in range(step - 1):
+            if not cap.grab():
+                return
+
+class SceneChangeFilter:
+    """Drops sampled frames that look like the last frame we kept.
+
+    Frames are compared on a tiny downscaled copy, either by the Hamming
+    distance between difference hashes ("dhash") or by the Bhattacharyya
+    distance between hue/saturation histograms ("histogram").
+    """
+
+    DEFAULT_THRESHOLDS = {"dhash": 10, "histogram": 0.3}
+
+    def __init__(self, method="dhash", threshold=None):
+        if method not in self.DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unknown scene change method: {method}")
+        self.method = method
+        self.threshold = threshold if threshold is not None else self.DEFAULT_THRESHOLDS[method]
+        self.last_signature = None
+
+    def signature(self, frame):
+        if self.method == "dhash":
+            small = cv2.resize(frame, (DHASH_SIZE + 1, DHASH_SIZE), interpolation=cv2.INTER_AREA)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            return gray[:, 1:] > gray[:, :-1]
+        small = cv2.resize(frame, HISTOGRAM_FRAME_SIZE, interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+        histogram = cv2.calcHist([hsv], [0, 1], None, [16, 16], [0, 180, 0, 256])
+        return cv2.normalize(histogram, histogram)
+
+    def distance(self, a, b):
+        if self.method == "dhash":
+            return np.count_nonzero(a != b)
+        return cv2.compareHist(a, b, cv2.HISTCMP_BHATTACHARYYA)
+
+    def is_new_scene(self, frame):
+        signature = self.signature(frame)
+        if self.last_signature is not None and self.distance(signature, self.last_signature) <= self.threshold:
+            return False
+        self.last_signature = signature
+        return True
+
+def format_timestamp(timestamp_ms):
+    """Convert a position in the video to an ISO 8601 timestamp."""
+    return (datetime(1970, 1, 1) + timedelta(milliseconds=timestamp_ms)).isoformat() + 'Z'
+
+def put_until_stopped(target_queue, item, stop_event):
+    """Block on a bounded queue, giving up if the consumer has stopped."""
+    while not stop_event.is_set():
+        try:
+            target_queue.put(item, timeout=QUEUE_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def decode_frames(video_id, video_uuid, video_data, frame_queue, stop_event, interval=1, every_seconds=None, scene_method=None, scene_threshold=None, resume_after=None, download=None):
+    """Decoder stage: sample, deduplicate, encode and crop frames onto ``frame_queue``.
+
+    With ``download`` set, ``video_data`` is a file still being written and
+    reads wait for the download to get ahead of them.
+
+    Always finishes by putting ``None`` on the queue, preceded by the exception
+    if decoding failed.
+    """
+    before_frame = None
+    if download is not None:
+        # The container header has to be on disk before the file can be opened
+        download.wait_for_bytes(DOWNLOAD_LEAD_BYTES, stop_event)
     cap = cv2.VideoCapture(video_data)
-    frame_count = 0
-    success, frame = cap.read()
-    
-    while success:
-        if frame_count % interval == 0:
-            frame_filename = f"frame_{frame_count}.jpg"
-            is_success, buffer = cv2.imencode(".jpg", frame)
-            frame_data = BytesIO(buffer)
-            
-            # Save frame_data to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_frame_file:
-                temp_frame_file.write(frame_data.getbuffer())
-                temp_frame_file_path = temp_frame_file.name
-            
-            # # Check if frame already exists in storage
-            # try:
-            #     supabase.storage.from_("frames").download(frame_filename)
-            #     logging.warning(f"Frame {frame_filename} already exists in storage. Skipping upload.")
-            #     os.remove(temp_frame_file_path)
-            #     continue
-            # except Exception as e:
-            #     if 'Not Found' not in str(e):
-            #         logging.error(f"Failed to check frame {frame_filename}: {str(e)}")
-            #         os.remove(temp_frame_file_path)
-            #         continue
-            
-            # Upload frame to Supabase storage
-            logging.info(f"Uploading frame {frame_count} to Supabase storage")
-            supabase.storage.from_("frames").upload(frame_filename, temp_frame_file_path)
-            
-            # Generate embedding for the frame
-            image = Image.open(temp_frame_file_path)
-            embedding = generate_embedding(image)
+    if download is not None and cap.isOpened():
+        frame_total = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+
+        def before_frame(frame_number):
+            fraction = frame_number / frame_total if frame_total > 0 else 1.0
+            download.wait_for_fraction(fraction, stop_event)
+    if not cap.isOpened():
+        cap.release()
+        put_until_stopped(frame_queue, VideoOpenError(f"Could not open video for video ID {video_id}"), stop_event)
+        put_until_stopped(frame_queue, None, stop_event)
+        return
+    scene_filter = SceneChangeFilter(scene_method, scene_threshold) if scene_method else None
+    # The last kept frame stays open until the next kept frame ends its time range
+    open_frame = None
+    last_timestamp = None
+    last_sampled = resume_after
+    try:
+        for frame_count, timestamp_ms, frame in iter_sampled_frames(cap, interval, every_seconds, resume_after, before_frame):
+            timestamp = format_timestamp(timestamp_ms)
+            last_timestamp = timestamp
+            last_sampled = frame_count
+            if scene_filter is not None and not scene_filter.is_new_scene(frame):
+                continue
             
-            # Get the timestamp in ISO 8601 format
-            timestamp_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
-            timestamp = (datetime(1970, 1, 1) + timedelta(milliseconds=timestamp_ms)).isoformat() + 'Z'
+            is_success, buffer = cv2.imencode(".jpg", frame)
+            if not is_success:
+                logging.error(f"Failed to encode frame {frame_count}. Skipping.")
+                continue
+            jpeg = buffer.tobytes()
             
-            # Insert frame record into frames_records table
-            frame_record = {
-                "id": str(uuid4()),
+            if open_frame is not None:
+                open_frame["end_timestamp"] = timestamp
+                if not put_until_stopped(frame_queue, open_frame, stop_event):
+                    return
+            open_frame = {
                 "video_uuid": video_uuid,
                 "video_id": video_id,
                 "frame_number": frame_count,
-                "storage_path": frame_filename,
-                "created_at": datetime.utcnow().isoformat(),
-                "timestamp": timestamp,  # Timestamp in ISO 8601 format
-                "embedding": embedding.tolist()  # Store the embedding
+                "storage_path": frame_storage_path(video_id, jpeg),
+                "timestamp": timestamp,
+                "jpeg": jpeg,
+                # Preprocess now so the queue only holds model-sized crops
+                "crop": preprocess_frame(frame),
             }
-            logging.info(f"Inserting frame record for frame {frame_count} into database")
-            supabase.from_("frames_records").insert(frame_record).execute()
-            
-            # Clean up the temporary file
-            os.remove(temp_frame_file_path)
         
-        success, frame = cap.read()
-        frame_count += 1
-    
-    cap.release()
+        if open_frame is not None:
+            open_frame["end_timestamp"] = last_timestamp
+            if not put_until_stopped(frame_queue, open_frame, stop_event):
+                return
+
+        if not decoded_to_end(cap, last_sampled, interval, every_seconds):
+            raise TruncatedVideoError(
+                f"Decoding video ID {video_id} stopped at frame {last_sampled} of "
+                f"{int(cap.get(cv2.CAP_PROP_FRAME_COUNT))}"
+            )
+    except Exception as e:
+        logging.error(f"Failed to decode frames for video ID {video_id}: {str(e)}")
+        put_until_stopped(frame_queue, e, stop_event)
+    finally:
+        cap.release()
+        put_until_stopped(frame_queue, None, stop_event)
+
+def load_progress(video_uuid):
+    response = (
+        supabase.from_("frame_extraction_progress")
+        .select("*")
+        .eq("video_uuid", video_uuid)
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+def save_progress(video_uuid, video_id, last_frame_number, last_timestamp, completed=False):
+    supabase.from_("frame_extraction_progress").upsert({
+        "video_uuid": video_uuid,
+        "video_id": video_id,
+        "last_frame_number": last_frame_number,
+        "last_timestamp": last_timestamp,
+        "completed": completed,
+        "updated_at": datetime.utcnow().isoformat(),
+    }).execute()
+
+def extract_frames_and_upload(video_id, video_uuid, video_data, interval=1, batch_size=DEFAULT_BATCH_SIZE, every_seconds=None, scene_method=None, scene_threshold=None, upload_workers=DEFAULT_UPLOAD_WORKERS, resume=False, embedding_format=None, download=None):
+    """Run the decode, inference and upload stages of one video concurrently.
+
+    A decoder thread feeds a bounded frame queue, the calling thread embeds
+    full batches, and a pool of upload workers stores frames and records. At
+    most ``2 * upload_workers`` embedded batches wait for upload at a time, so
+    every stage applies backpressure to the one before it.
+
+    Progress is checkpointed to ``frame_extraction_progress`` every
+    ``PROGRESS_CHECKPOINT_BATCHES`` batches, covering only the leading batches
+    whose records are known to be written. With ``resume`` set, extraction
+    continues after the last checkpointed frame. The video is only marked
+    completed once decoding reached its end; ``TruncatedVideoError`` is
+    raised otherwise, leaving the last checkpoint in place.
+    """
+    logging.info(f"Extracting frames from video ID: {video_id}")
+    embedding_format = embedding_format or FrameEmbeddingFormat()
+    progress = load_progress(video_uuid) if resume else None
+    resume_after = progress["last_frame_number"] if progress else None
+    # Last frame whose record, and every record before it, is known to be written
+    last_checkpoint = (
+        {"frame_number": progress["last_frame_number"], "timestamp": progress["last_timestamp"]}
+        if progress and progress["last_frame_number"] is not None
+        else None
+    )
+    frame_queue = queue.Queue(maxsize=2 * batch_size)
+    stop_event = threading.Event()
+    decoder = threading.Thread(
+        target=decode_frames,
+        args=(video_id, video_uuid, video_data, frame_queue, stop_event),
+        kwargs={
+            "interval": interval,
+            "every_seconds": every_seconds,
+            "scene_method": scene_method,
+            "scene_threshold": scene_threshold,
+            "resume_after": resume_after,
+            "download": download,
+        },
+        daemon=True,
+    )
+    upload_slots = threading.BoundedSemaphore(2 * upload_workers)
+    # (future, last frame) per submitted batch, oldest first
+    upload_futures = deque()
+    record_buffer = FrameRecordBuffer()
+    uploaded_frames = UploadedFrames(video_id)
+
+    def submit_batch(upload_pool, frames):
+        outputs = generate_embeddings([frame.pop("crop") for frame in frames], embedding_format.features)
+        embeddings = embedding_format.transform(outputs)
+        upload_slots.acquire()
+        future = upload_pool.submit(
+            upload_frame_batch, frames, embeddings, record_buffer, uploaded_frames, embedding_format
+        )
+        future.add_done_callback(lambda _: upload_slots.release())
+        upload_futures.append((future, frames[-1]))
+
+    def checkpoint():
+        nonlocal last_checkpoint
+        last_frame = None
+        while upload_futures and upload_futures[0][0].done():
+            future, frame = upload_futures.popleft()
+            future.result()
+            last_frame = frame
+        if last_frame is None:
+            return
+        record_buffer.flush()
+        if not record_buffer.failed:
+            save_progress(video_uuid, video_id, last_frame["frame_number"], last_frame["timestamp"])
+            last_checkpoint = last_frame
+
+    decoder.start()
+    try:
+        with ThreadPoolExecutor(max_workers=upload_workers) as upload_pool:
+            pending_frames = []
+            submitted_batches = 0
+            while True:
+                item = frame_queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                pending_frames.append(item)
+                
+                # Embed once a full batch has been collected
+                if len(pending_frames) >= batch_size:
+                    submit_batch(upload_pool, pending_frames)
+                    pending_frames = []
+                    submitted_batches += 1
+                    if submitted_batches % PROGRESS_CHECKPOINT_BATCHES == 0:
+                        checkpoint()
+            
+            if pending_frames:
+                submit_batch(upload_pool, pending_frames)
+    finally:
+        stop_event.set()
+        decoder.join()
+
+    for future, frame in upload_futures:
+        future.result()
+        last_checkpoint = frame
+    record_buffer.flush()
+    save_progress(
+        video_uuid,
+        video_id,
+        last_checkpoint["frame_number"] if last_checkpoint else None,
+        last_checkpoint["timestamp"] if last_checkpoint else None,
+        completed=True,
+    )
     logging.info(f"Finished extracting frames for video ID: {video_id}")
 
 def fetch_video_ids():
@@ -159,46 +789,288 @@ def fetch_video_ids():
     logging.info("Video IDs and UUIDs fetched successfully")
     return list(video_data)
 
-def main(interval=1):
-    logging.info("Starting main process")
-    video_data = fetch_video_ids()
-    print("VIDEO IDS", len(video_data))  # works until here, able to grab video ids 
-    for video_id, id in video_data:
-        youtube_url = f"https://www.youtube.com/watch?v={video_id}"
-        video_data = download_youtube_video(youtube_url) 
-        
-        if video_data is None:  # Check if download failed
+def download_video_to_file(video_id, target_resolution=DEFAULT_TARGET_RESOLUTION):
+    """Download a YouTube video into a temporary .mp4 file and return its path."""
+    stream = get_youtube_stream(f"https://www.youtube.com/watch?v={video_id}", target_resolution)
+    return download_stream_to_file(stream) if stream is not None else None
+
+def collect_frame_features(video_path, features, interval=1, every_seconds=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Run the model over a video's sampled frames without storing anything."""
+    cap = cv2.VideoCapture(video_path)
+    outputs = []
+    crops = []
+    try:
+        for _, _, frame in iter_sampled_frames(cap, interval, every_seconds):
+            crops.append(preprocess_frame(frame))
+            if len(crops) >= batch_size:
+                outputs.append(generate_embeddings(crops, features))
+                crops = []
+        if crops:
+            outputs.append(generate_embeddings(crops, features))
+    finally:
+        cap.release()
+    return np.concatenate(outputs) if outputs else None
+
+def fit_pca_from_videos(path, dim, num_videos, features, interval=1, every_seconds=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Fit the PCA projection used by ``FrameEmbeddingFormat`` on a sample of videos."""
+    samples = []
+    for video_id, _ in fetch_video_ids()[:num_videos]:
+        temp_video_file_path = download_video_to_file(video_id)
+        if temp_video_file_path is None:
             logging.warning(f"Skipping video ID {video_id} due to download failure.")
-            continue  # Skip to the next video
-        
-        # Save video_data to a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp_video_file:
-            temp_video_file.write(video_data.getbuffer())
-            temp_video_file_path = temp_video_file.name
-        
-        # # Check if video already exists in storage
-        # try:
-        #     supabase.storage.from_("videos").download(f"{video_id}.mp4")
-        #     logging.warning(f"Video {video_id} already exists in storage. Skipping upload.")
-        #     os.remove(temp_video_file_path)
-        #     continue
-        # except Exception as e:
-        #     if 'Not Found' not in str(e):
-        #         logging.error(f"Failed to check video {video_id}: {str(e)}")
-        #         os.remove(temp_video_file_path)
-        #         continue
-        
-        # Upload video to Supabase storage
-        logging.info(f"Uploading video {video_id} to Supabase storage")
-        supabase.storage.from_("videos").upload(f"{video_id}.mp4", temp_video_file_path)
-        
-        extract_frames_and_upload(video_id, id, temp_video_file_path, interval)
-        
-        # Clean up the temporary file
-        os.remove(temp_video_file_path)
-        
+            continue
+        try:
+            video_features = collect_frame_features(temp_video_file_path, features, interval, every_seconds, batch_size)
+        finally:
+            os.remove(temp_video_file_path)
+        if video_features is not None:
+            samples.append(video_features)
+
+    if not samples:
+        raise RuntimeError("No frames were sampled, so no PCA projection could be fitted.")
+    fit_pca(np.concatenate(samples), dim, path)
+
+def load_calibration_batches(num_frames, batch_size=DEFAULT_BATCH_SIZE):
+    """Sample frames spread across the first downloadable video as calibration batches."""
+    for video_id, _ in fetch_video_ids():
+        temp_video_file_path = download_video_to_file(video_id)
+        if temp_video_file_path is None:
+            continue
+        cap = cv2.VideoCapture(temp_video_file_path)
+        crops = []
+        try:
+            for _, _, frame in iter_sampled_frames(cap, every_seconds=CALIBRATION_EVERY_SECONDS):
+                crops.append(preprocess_frame(frame))
+                if len(crops) >= num_frames:
+                    break
+        finally:
+            cap.release()
+            os.remove(temp_video_file_path)
+        if crops:
+            logging.info(f"Calibrating on {len(crops)} frames from video ID {video_id}")
+            return [frames_to_tensor(crops[i:i + batch_size]) for i in range(0, len(crops), batch_size)]
+    raise RuntimeError("Could not sample calibration frames from any video.")
+
+def prepare_embedding_backend(name, features, calibration_frames=DEFAULT_CALIBRATION_FRAMES, min_cosine=DEFAULT_MIN_COSINE, batch_size=DEFAULT_BATCH_SIZE):
+    """Load the requested backend, sampling calibration frames if it needs them.
+
+    Returns the calibration batches so worker processes can reuse them.
+    """
+    calibration_batches = None
+    if name != "eager":
+        calibration_batches = load_calibration_batches(calibration_frames, batch_size)
+    load_embedding_backend(name, features, calibration_batches, min_cosine)
+    return calibration_batches
+
+def iter_incomplete_videos(page_size=VIDEO_PAGE_SIZE):
+    """Page through the whole youtube table, skipping fully processed videos."""
+    last_id = None
+    while True:
+        query = supabase.from_("youtube").select("video_id, id").order("id").limit(page_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.execute().data
+        if not page:
+            return
+        last_id = page[-1]["id"]
+
+        completed = {
+            item["video_uuid"]
+            for item in supabase.from_("frame_extraction_progress")
+            .select("video_uuid")
+            .in_("video_uuid", [item["id"] for item in page])
+            .eq("completed", True)
+            .execute()
+            .data
+        }
+        logging.info(f"Fetched {len(page)} videos, {len(completed)} already complete")
+        for item in page:
+            if item["id"] not in completed:
+                yield item["video_id"], item["id"]
+
+        if len(page) < page_size:
+            return
+
+def process_video(video_id, video_uuid, resume=False, target_resolution=DEFAULT_TARGET_RESOLUTION, decode_while_downloading=False, **extract_options):
+    """Download one video and extract its frames.
+
+    With ``decode_while_downloading`` frames are decoded from the temporary
+    file while it is still being downloaded, so the video is only fetched
+    once. If OpenCV cannot open the partial file (its index may sit at the
+    end), extraction waits for the download to finish, and if decoding
+    catches up with the download it resumes from the finished file after
+    the last checkpoint.
+
+    Returns ``(video_id, error)`` where ``error`` is None on success, so one
+    broken video never stops the rest of a backfill.
+    """
+    try:
+        stream = get_youtube_stream(f"https://www.youtube.com/watch?v={video_id}", target_resolution)
+        if stream is None:
+            logging.warning(f"Skipping video ID {video_id} due to download failure.")
+            return video_id, "download failed"
+
+        # Only a decoder reading the partial file needs the size up front
+        total_bytes = stream.filesize if decode_while_downloading else None
+        fd, download_path = tempfile.mkstemp(suffix=".mp4")
+        os.close(fd)
+        progress = DownloadProgress(download_path, total_bytes)
+        with ThreadPoolExecutor(max_workers=1) as downloader:
+            download = downloader.submit(download_stream_to_file, stream, download_path, progress)
+            extracted = False
+            if decode_while_downloading:
+                try:
+                    extract_frames_and_upload(video_id, video_uuid, download_path, resume=resume, download=progress, **extract_options)
+                    extracted = True
+                except VideoOpenError:
+                    logging.warning(f"Could not decode video ID {video_id} while it downloads. Waiting for the download.")
+                except TruncatedVideoError as e:
+                    logging.warning(f"{e}. Resuming once the download finishes.")
+                    resume = True
+                except Exception:
+                    temp_video_file_path = download.result()
+                    if temp_video_file_path is not None:
+                        os.remove(temp_video_file_path)
+                    raise
+            temp_video_file_path = download.result()
+
+        if temp_video_file_path is None:  # Check if download failed
+            logging.warning(f"Skipping video ID {video_id} due to download failure.")
+            return video_id, "download failed"
+
+        try:
+            # Upload video to Supabase storage
+            logging.info(f"Uploading video {video_id} to Supabase storage")
+            upload_if_absent("videos", f"{video_id}.mp4", temp_video_file_path, "video/mp4")
+
+            if not extracted:
+                extract_frames_and_upload(video_id, video_uuid, temp_video_file_path, resume=resume, **extract_options)
+        finally:
+            # Clean up the temporary file
+            os.remove(temp_video_file_path)
+        return video_id, None
+    except Exception as e:
+        logging.error(f"Failed to process video ID {video_id}: {str(e)}")
+        return video_id, str(e)
+
+# Options for process_video, set once per worker process by init_worker
+worker_options = {}
+
+def init_worker(num_threads, backend, features, calibration_batches, min_cosine, options):
+    """Pool initializer: cap torch threads and load the model once per worker."""
+    global worker_options
+    configure_torch_threads(num_threads)
+    load_embedding_backend(backend, features, calibration_batches, min_cosine)
+    worker_options = options
+
+def process_video_in_worker(video):
+    video_id, video_uuid = video
+    return process_video(video_id, video_uuid, **worker_options)
+
+def summarize_results(results):
+    failures = {video_id: error for video_id, error in results if error is not None}
+    logging.info(f"Processed {len(results)} videos: {len(results) - len(failures)} succeeded, {len(failures)} failed")
+    for video_id, error in failures.items():
+        logging.info(f"  {video_id}: {error}")
+    return failures
+
+def main(num_threads=None, incremental=False, backend="eager", calibration_frames=DEFAULT_CALIBRATION_FRAMES, min_cosine=DEFAULT_MIN_COSINE, workers=1, **extract_options):
+    """Extract frames for each video.
+
+    In incremental mode every video in the youtube table is visited, completed
+    videos are skipped and partially processed ones resume where they stopped.
+    With ``workers`` > 1 videos are spread across that many processes, each
+    loading the model once and using ``num_threads`` torch threads (by default
+    an equal share of the cores).
+    """
+    logging.info("Starting main process")
+    embedding_format = extract_options.get("embedding_format") or FrameEmbeddingFormat()
+    batch_size = extract_options.get("batch_size", DEFAULT_BATCH_SIZE)
+    if incremental:
+        video_data = iter_incomplete_videos()
+    else:
+        video_data = fetch_video_ids()
+        print("VIDEO IDS", len(video_data))  # works until here, able to grab video ids 
+
+    results = []
+    if workers <= 1:
+        configure_torch_threads(num_threads)
+        prepare_embedding_backend(backend, embedding_format.features, calibration_frames, min_cosine, batch_size)
+        for video_id, id in video_data:
+            results.append(process_video(video_id, id, resume=incremental, **extract_options))
+    else:
+        calibration_batches = None
+        if backend != "eager":
+            calibration_batches = load_calibration_batches(calibration_frames, batch_size)
+        threads_per_worker = num_threads or max(1, (os.cpu_count() or 1) // workers)
+        logging.info(f"Starting {workers} worker processes with {threads_per_worker} torch threads each")
+        # Spawned workers get their own Supabase client instead of sharing forked connections
+        with mp.get_context("spawn").Pool(
+            workers,
+            initializer=init_worker,
+            initargs=(
+                threads_per_worker, backend, embedding_format.features, calibration_batches, min_cosine,
+                {"resume": incremental, **extract_options},
+            ),
+        ) as pool:
+            for video_id, error in pool.imap_unordered(process_video_in_worker, video_data):
+                results.append((video_id, error))
+                logging.info(f"[{len(results)}] Video ID {video_id} {'failed' if error else 'done'}")
+
+    summarize_results(results)
     logging.info("Main process completed")
+    return results
 
 if __name__ == "__main__":
-    interval = 1
-    main(interval)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Extract, embed and upload frames from YouTube videos.')
+    parser.add_argument('--interval', type=int, default=1, help='Keep every n-th frame')
+    parser.add_argument('--every-seconds', type=float, default=None, help='Keep one frame per this many seconds (overrides --interval)')
+    parser.add_argument('--scene-method', choices=['dhash', 'histogram'], default=None, help='Only keep frames that differ from the last kept frame')
+    parser.add_argument('--scene-threshold', type=float, default=None, help='Distance above which a frame counts as a new scene')
+    parser.add_argument('--target-resolution', type=int, default=DEFAULT_TARGET_RESOLUTION, help='Download the lowest stream at least this many pixels tall')
+    parser.add_argument('--decode-while-downloading', action='store_true', help='Decode frames from the temporary file while the video is still downloading')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Frames per model forward pass')
+    parser.add_argument('--upload-workers', type=int, default=DEFAULT_UPLOAD_WORKERS, help='Concurrent frame upload/insert workers per video')
+    parser.add_argument('--num-threads', type=int, default=None, help='Torch intra-op threads per process (defaults to an equal share of the cores)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes to spread videos across')
+    parser.add_argument('--incremental', action='store_true', help='Process every unfinished video, resuming partially processed ones')
+    parser.add_argument('--features', choices=FEATURE_MODES, default='logits', help='Store ImageNet logits or pooled penultimate-layer features')
+    parser.add_argument('--pca-path', default=None, help='PCA projection (.npz) applied to every embedding')
+    parser.add_argument('--normalize', action='store_true', help='L2-normalize embeddings before storing them')
+    parser.add_argument('--dtype', choices=STORAGE_DTYPES, default='float32', help='Storage precision of the embeddings')
+    parser.add_argument('--backend', choices=BACKENDS, default='eager', help='Inference backend for frame embeddings')
+    parser.add_argument('--calibration-frames', type=int, default=DEFAULT_CALIBRATION_FRAMES, help='Frames used to calibrate and verify optimized backends')
+    parser.add_argument('--min-cosine', type=float, default=DEFAULT_MIN_COSINE, help='Minimum mean cosine similarity to the fp32 reference')
+    parser.add_argument('--fit-pca', metavar='PATH', default=None, help='Fit a PCA projection on sampled videos, save it to PATH and exit')
+    parser.add_argument('--pca-dim', type=int, default=256, help='Output dimension of a fitted PCA projection')
+    parser.add_argument('--pca-videos', type=int, default=5, help='Number of videos to sample when fitting PCA')
+    args = parser.parse_args()
+
+    if args.fit_pca:
+        configure_torch_threads(args.num_threads)
+        prepare_embedding_backend(
+            args.backend, args.features, args.calibration_frames, args.min_cosine, args.batch_size
+        )
+        fit_pca_from_videos(
+            args.fit_pca, args.pca_dim, args.pca_videos, args.features,
+            interval=args.interval, every_seconds=args.every_seconds, batch_size=args.batch_size,
+        )
+        sys.exit(0)
+
+    main(
+        num_threads=args.num_threads,
+        incremental=args.incremental,
+        workers=args.workers,
+        backend=args.backend,
+        calibration_frames=args.calibration_frames,
+        min_cosine=args.min_cosine,
+        interval=args.interval,
+        every_seconds=args.every_seconds,
+        scene_method=args.scene_method,
+        scene_threshold=args.scene_threshold,
+        batch_size=args.batch_size,
+        upload_workers=args.upload_workers,
+        target_resolution=args.target_resolution,
+        decode_while_downloading=args.decode_while_downloading,
+        embedding_format=FrameEmbeddingFormat(args.features, args.pca_path, args.normalize, args.dtype),
+    )
\ No newline at end of file
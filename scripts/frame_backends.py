@@ -0,0 +1,159 @@
+import copy
+import logging
+import os
+import tempfile
+
+import numpy as np
+import torch
+from torchvision.models import resnet50
+
+# Available inference backends for frame embeddings
+BACKENDS = ("eager", "torchscript", "onnx", "int8")
+
+# Backends are rejected when their mean cosine similarity to the fp32 eager
+# reference on the calibration frames falls below this
+DEFAULT_MIN_COSINE = 0.98
+
+
+def load_network(features="logits"):
+    """Load the pre-trained ResNet, optionally without its classifier head.
+
+    With ``features="penultimate"`` the network returns the pooled 2048-d
+    features instead of the 1000-way ImageNet logits.
+    """
+    network = resnet50(pretrained=True)
+    if features == "penultimate":
+        network = torch.nn.Sequential(*list(network.children())[:-1], torch.nn.Flatten())
+    network.eval()
+    return network
+
+
+class EagerBackend:
+    """fp32 eager-mode PyTorch, the reference every other backend is checked against."""
+
+    name = "eager"
+
+    def __init__(self, network, features):
+        self.network = network
+        self.features = features
+
+    def __call__(self, batch):
+        with torch.inference_mode():
+            return self.network(batch).numpy()
+
+
+class TorchScriptBackend(EagerBackend):
+    """Traced, frozen and inference-optimized TorchScript graph."""
+
+    name = "torchscript"
+
+    def __init__(self, network, features, example):
+        with torch.no_grad():
+            traced = torch.jit.trace(network, example)
+        super().__init__(torch.jit.optimize_for_inference(torch.jit.freeze(traced)), features)
+
+
+class Int8Backend(EagerBackend):
+    """Statically int8-quantized network, calibrated on real frames (FX graph mode)."""
+
+    name = "int8"
+
+    def __init__(self, network, features, calibration_batches):
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+        prepared = prepare_fx(
+            copy.deepcopy(network),
+            get_default_qconfig_mapping("x86"),
+            example_inputs=(calibration_batches[0],),
+        )
+        # Observers update their statistics in place, which inference mode forbids
+        with torch.no_grad():
+            for batch in calibration_batches:
+                prepared(batch)
+        super().__init__(convert_fx(prepared), features)
+
+
+class OnnxBackend:
+    """ONNX Runtime session with full graph optimizations."""
+
+    name = "onnx"
+
+    def __init__(self, network, features, example):
+        import onnxruntime
+
+        self.features = features
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = torch.get_num_threads()
+
+        with tempfile.TemporaryDirectory() as export_dir:
+            model_path = os.path.join(export_dir, "frame_embedding.onnx")
+            torch.onnx.export(
+                network,
+                example,
+                model_path,
+                input_names=["frames"],
+                output_names=["embeddings"],
+                dynamic_axes={"frames": {0: "batch"}, "embeddings": {0: "batch"}},
+            )
+            self.session = onnxruntime.InferenceSession(
+                model_path, options, providers=["CPUExecutionProvider"]
+            )
+
+    def __call__(self, batch):
+        return self.session.run(None, {"frames": batch.numpy()})[0]
+
+
+def check_backend_accuracy(backend, reference, batches, min_cosine=DEFAULT_MIN_COSINE):
+    """Compare a backend's outputs with the fp32 reference on the given batches.
+
+    Returns the mean and minimum per-frame cosine similarity, raising a
+    ValueError when the mean falls below ``min_cosine``.
+    """
+    similarities = []
+    for batch in batches:
+        expected = reference(batch)
+        actual = backend(batch)
+        similarities.append(
+            np.sum(expected * actual, axis=1)
+            / np.maximum(np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1), 1e-12)
+        )
+    similarities = np.concatenate(similarities)
+    mean_cosine, min_frame_cosine = float(similarities.mean()), float(similarities.min())
+    logging.info(
+        f"{backend.name} backend vs fp32 reference: mean cosine {mean_cosine:.5f}, min {min_frame_cosine:.5f}"
+    )
+    if mean_cosine < min_cosine:
+        raise ValueError(
+            f"{backend.name} backend is too far from the fp32 reference "
+            f"(mean cosine {mean_cosine:.5f} < {min_cosine})"
+        )
+    return {"mean_cosine": mean_cosine, "min_cosine": min_frame_cosine}
+
+
+def create_backend(name="eager", features="logits", calibration_batches=None, min_cosine=DEFAULT_MIN_COSINE):
+    """Build an inference backend, verifying it against the fp32 reference.
+
+    Every backend other than ``eager`` needs ``calibration_batches``: a list
+    of preprocessed NCHW tensors of real frames, used to trace or calibrate
+    the model and then to check its accuracy.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name}")
+    logging.info(f"Loading {name} inference backend for {features} features")
+    reference = EagerBackend(load_network(features), features)
+    if name == "eager":
+        return reference
+    if not calibration_batches:
+        raise ValueError(f"The {name} backend needs calibration frames")
+
+    example = calibration_batches[0]
+    if name == "torchscript":
+        backend = TorchScriptBackend(reference.network, features, example)
+    elif name == "onnx":
+        backend = OnnxBackend(reference.network, features, example)
+    else:
+        backend = Int8Backend(reference.network, features, calibration_batches)
+    check_backend_accuracy(backend, reference, calibration_batches, min_cosine)
+    return backend
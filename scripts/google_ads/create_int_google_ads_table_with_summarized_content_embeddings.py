@@ -1,6 +1,4 @@
 from enum import Enum
-from openai.types.chat.parsed_chat_completion import ParsedChatCompletion
-import openai
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api._errors import (
     NoTranscriptAvailable,
@@ -17,7 +15,7 @@ import os
 from dotenv import load_dotenv
 import supabase
 import re
-import multiprocessing as mp
+import asyncio
 from tqdm import tqdm
 import whisper
 import yt_dlp
@@ -27,6 +25,9 @@ from scripts.google_ads.models import (
     VersionedGoogleAd,
     MediaDescription,
 )
+from scripts.helpers.async_openai import run_bounded
+from scripts.helpers.completion_cache import parse_completion_async
+from scripts.helpers.embeddings import embed_texts_async
 import requests
 from PIL import Image
 from io import BytesIO
@@ -147,18 +148,20 @@ def extract_youtube_video_id(url: str | None) -> str | None:
 
 
 # Process video
-def process_video(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
+async def process_video(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
     try:
         video_id: str | None = extract_youtube_video_id(record.content)
         if video_id is None:
             print("Invalid video id:", record.content)
             return
 
-        transcript = get_youtube_transcript(
-            video_id=video_id, retrieval_method=TranscriptRetrievalMethod.AUTO_GENERATED
+        transcript = await asyncio.to_thread(
+            get_youtube_transcript,
+            video_id=video_id,
+            retrieval_method=TranscriptRetrievalMethod.AUTO_GENERATED,
         )
 
-        response: ParsedChatCompletion = openai.beta.chat.completions.parse(
+        video_description: MediaDescription = await parse_completion_async(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -172,21 +175,8 @@ def process_video(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
             ],
             response_format=MediaDescription,
         )
-
-        video_description: MediaDescription = response.choices[0].message.parsed
-        summary_embeddings: list[float] = (
-            openai.embeddings.create(
-                input=video_description.summary, model="text-embedding-3-small"
-            )
-            .data[0]
-            .embedding
-        )
-        advertiser_name_embedding = (
-            openai.embeddings.create(
-                input=record.advertiser_name, model="text-embedding-3-small"
-            )
-            .data[0]
-            .embedding
+        summary_embeddings, advertiser_name_embedding = await embed_texts_async(
+            [video_description.summary, record.advertiser_name]
         )
         return EmbeddedGoogleAd(
             versioned_ad_id=record.id,
@@ -210,9 +200,9 @@ def process_video(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
         print(f"Error with ad ({record.advertisement_url}):", type(e))
 
 
-def process_text(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
+async def process_text(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
     try:
-        response: ParsedChatCompletion = openai.beta.chat.completions.parse(
+        video_description: MediaDescription = await parse_completion_async(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -226,21 +216,8 @@ def process_text(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
             ],
             response_format=MediaDescription,
         )
-
-        video_description: MediaDescription = response.choices[0].message.parsed
-        summary_embeddings: list[float] = (
-            openai.embeddings.create(
-                input=video_description.summary, model="text-embedding-3-small"
-            )
-            .data[0]
-            .embedding
-        )
-        advertiser_name_embedding = (
-            openai.embeddings.create(
-                input=record.advertiser_name, model="text-embedding-3-small"
-            )
-            .data[0]
-            .embedding
+        summary_embeddings, advertiser_name_embedding = await embed_texts_async(
+            [video_description.summary, record.advertiser_name]
         )
         return EmbeddedGoogleAd(
             versioned_ad_id=record.id,
@@ -296,10 +273,12 @@ def get_text_from_image_url(image_url: str) -> str:
     return " ".join(extracted_text)
 
 
-def process_image(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
+async def process_image(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
     try:
-        text_content: str = get_text_from_image_url(record.content)
-        response: ParsedChatCompletion = openai.beta.chat.completions.parse(
+        text_content: str = await asyncio.to_thread(
+            get_text_from_image_url, record.content
+        )
+        video_description: MediaDescription = await parse_completion_async(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -313,21 +292,8 @@ def process_image(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
             ],
             response_format=MediaDescription,
         )
-
-        video_description: MediaDescription = response.choices[0].message.parsed
-        summary_embeddings: list[float] = (
-            openai.embeddings.create(
-                input=video_description.summary, model="text-embedding-3-small"
-            )
-            .data[0]
-            .embedding
-        )
-        advertiser_name_embedding = (
-            openai.embeddings.create(
-                input=record.advertiser_name, model="text-embedding-3-small"
-            )
-            .data[0]
-            .embedding
+        summary_embeddings, advertiser_name_embedding = await embed_texts_async(
+            [video_description.summary, record.advertiser_name]
         )
         return EmbeddedGoogleAd(
             versioned_ad_id=record.id,
@@ -341,17 +307,17 @@ def process_image(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
 
 # Get transcripts for record and create embeddings
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def process_record(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
+async def process_record(record: VersionedGoogleAd) -> EmbeddedGoogleAd:
     if record.format == "Video":
-        # return process_video(record)
+        # return await process_video(record)
         return None
     elif record.format == "Text":
-        return process_text(record)
+        return await process_text(record)
     elif record.format == "Image":
-        return process_image(record)
+        return await process_image(record)
 
 
-if __name__ == "__main__":
+async def main():
     for record_format in ["Video", "Image", "Text"]:
         records = get_records(record_format)
 
@@ -370,13 +336,10 @@ if __name__ == "__main__":
                     pass
                 pbar.update(1)
 
-            with mp.Pool(mp.cpu_count()) as p:
-                for record in records:
-                    p.apply_async(
-                        process_record, args=(record,), callback=update_progress
-                    )
-
-                p.close()
-                p.join()
+            await run_bounded(process_record, records, update_progress)
 
     print("All content processed successfully")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+import multiprocessing as mp
+import os
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.remote.webdriver import WebDriver
+from webdriver_manager.chrome import ChromeDriverManager
+
+# Chrome grows over a long session, so each worker restarts its browser
+# after this many pages
+PAGES_PER_DRIVER = int(os.getenv("PAGES_PER_DRIVER", "200"))
+
+_driver_path: str | None = None
+_driver: WebDriver | None = None
+_pages = 0
+_pages_per_driver = PAGES_PER_DRIVER
+
+
+def get_driver_path() -> str:
+    """Path of the chromedriver binary, resolved once per process.
+
+    ``ChromeDriverManager().install()`` checks for new releases on every
+    call, so resolve it in the parent and hand it to the pool initializer.
+    """
+    global _driver_path
+    if _driver_path is None:
+        _driver_path = ChromeDriverManager().install()
+    return _driver_path
+
+
+def create_driver(driver_path: str | None = None) -> WebDriver:
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    return webdriver.Chrome(
+        service=Service(driver_path or get_driver_path()), options=chrome_options
+    )
+
+
+def init_worker(driver_path: str | None = None, pages_per_driver: int = PAGES_PER_DRIVER):
+    """Pool initializer giving each worker process a browser of its own.
+
+    The driver is quit when the worker exits, which requires the pool to be
+    shut down with ``close`` and ``join`` rather than ``terminate``.
+    """
+    global _driver_path, _pages_per_driver
+    if driver_path is not None:
+        _driver_path = driver_path
+    _pages_per_driver = pages_per_driver
+    mp.util.Finalize(None, quit_driver, exitpriority=10)
+    get_driver()
+
+
+def is_alive(driver: WebDriver) -> bool:
+    try:
+        driver.execute_script("return 1")
+        return True
+    except WebDriverException:
+        return False
+
+
+def get_driver() -> WebDriver:
+    """This worker's driver, for loading one more page.
+
+    A driver that has loaded ``pages_per_driver`` pages, or whose browser
+    has crashed, is replaced with a fresh one first.
+    """
+    global _driver, _pages
+    if _driver is not None and (_pages >= _pages_per_driver or not is_alive(_driver)):
+        quit_driver()
+    if _driver is None:
+        _driver = create_driver(_driver_path)
+        _pages = 0
+    _pages += 1
+    return _driver
+
+
+def quit_driver():
+    global _driver
+    if _driver is not None:
+        try:
+            _driver.quit()
+        except WebDriverException:
+            pass
+        _driver = None
@@ -0,0 +1,345 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+from urllib3.util.retry import Retry
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from models import GoogleAd
+from scripts.helpers.batch_writer import BatchWriter
+from scripts.helpers.helpers import get_supabase_client
+
+# Load environment variables
+load_dotenv(".env.local")
+
+# The RPC the transparency page calls to render a creative's detail view
+CREATIVE_RPC_URL = (
+    "https://adstransparency.google.com/anji/_/rpc/LookupService/GetCreativeById"
+)
+ADVERTISER_URL = "https://adstransparency.google.com/advertiser/{advertiser_id}?region={region}"
+
+# Criteria ids the RPC takes in place of the region codes in page URLs
+REGION_IDS = {"US": 2840}
+
+# The RPC responds with protobuf-style JSON keyed by field number. These
+# numbers are read off the page's network traffic and are not yet checked
+# against recorded responses (see tests/test_fetch_google_ads.py), so
+# complete_ad refuses anything they don't fully parse
+FORMATS = {1: "Text", 2: "Image", 3: "Video"}
+CREATIVE = "1"
+ADVERTISER_ID = "1"
+FIRST_SHOWN = "3"
+LAST_SHOWN = "4"
+VARIATIONS = "5"
+FORMAT = "8"
+ADVERTISER_NAME = "12"
+PREVIEW_SCRIPT = ("1", "4")
+PREVIEW_HTML = ("3", "2")
+
+DEFAULT_WORKERS = 32
+REQUEST_TIMEOUT_SECONDS = 20
+
+CREATIVE_URL_PATTERN = re.compile(r"/advertiser/(AR\d+)/creative/(CR\d+)")
+IMAGE_SRC_PATTERN = re.compile(r"""<img[^>]+src=["']([^"']+)["']""")
+YOUTUBE_ID_PATTERN = re.compile(
+    r"(?:youtube\.com/(?:embed/|watch\?v=)|ytimg\.com/vi/|video_videoId\W+)([\w-]{11})"
+)
+
+# Columns this fetcher can fill. Targeting and stats are left to the browser
+# scrapers, so upserts never null out what they wrote
+FETCHED_COLUMNS = {
+    "advertisement_url",
+    "advertiser_name",
+    "advertiser_url",
+    "properties",
+    "media_links",
+}
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size: int = DEFAULT_WORKERS) -> requests.Session:
+    """Shared session, so every worker thread reuses the same keep-alive connections.
+
+    Throttling and transient server errors are retried with backoff,
+    honouring ``Retry-After``.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=5,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=None,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=4, pool_maxsize=pool_size, max_retries=retry
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.headers.update(
+                {
+                    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+                    "Origin": "https://adstransparency.google.com",
+                    "Referer": "https://adstransparency.google.com/",
+                }
+            )
+            _session = session
+    return _session
+
+
+def parse_creative_url(url: str) -> tuple[str, str, str]:
+    """Advertiser id, creative id and region code from a creative's page URL."""
+    match = CREATIVE_URL_PATTERN.search(urlparse(url).path)
+    if match is None:
+        raise ValueError(f"Not a creative URL: {url}")
+    region = parse_qs(urlparse(url).query).get("region", ["US"])[0]
+    return match.group(1), match.group(2), region
+
+
+def fetch_creative(advertiser_id: str, creative_id: str, region: str) -> dict[str, Any]:
+    request = {"1": advertiser_id, "2": creative_id, "5": {"1": 1}}
+    if region in REGION_IDS:
+        request["5"]["2"] = REGION_IDS[region]
+    response = get_session().post(
+        CREATIVE_RPC_URL,
+        params={"authuser": "0"},
+        data={"f.req": json.dumps(request)},
+        timeout=REQUEST_TIMEOUT_SECONDS,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def nested(data: Any, path: tuple[str, ...]) -> Any:
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def parse_timestamp(field: dict | None) -> datetime | None:
+    if not field or "1" not in field:
+        return None
+    return datetime.fromtimestamp(int(field["1"]), tz=timezone.utc)
+
+
+def format_date(shown: datetime | None) -> str | None:
+    """A date rendered the way the page shows it, e.g. "Mar 3, 2024"."""
+    if shown is None:
+        return None
+    return f"{shown:%b} {shown.day}, {shown.year}"
+
+
+def format_ran_for(first_shown: datetime | None, last_shown: datetime | None) -> str | None:
+    """The page's "Ran for" value, counting both the first and last day."""
+    if first_shown is None or last_shown is None:
+        return None
+    days = (last_shown.date() - first_shown.date()).days + 1
+    return f"{days} day" if days == 1 else f"{days} days"
+
+
+def video_link(preview_script_url: str) -> str | None:
+    """YouTube embed URL of a video creative, read from its preview script."""
+    response = get_session().get(preview_script_url, timeout=REQUEST_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    match = YOUTUBE_ID_PATTERN.search(response.text)
+    return f"https://www.youtube.com/embed/{match.group(1)}" if match else None
+
+
+def media_links(format_value: str | None, variations: list[dict]) -> list[str] | None:
+    """Image sources or YouTube links of every variation of a creative.
+
+    Text creatives are only rendered by their preview script, so they
+    return None and stay with the browser scraper.
+    """
+    if format_value not in ("Image", "Video"):
+        return None
+    links = []
+    for variation in variations:
+        if format_value == "Image":
+            html = nested(variation, PREVIEW_HTML) or ""
+            if match := IMAGE_SRC_PATTERN.search(html):
+                links.append(match.group(1))
+        elif script_url := nested(variation, PREVIEW_SCRIPT):
+            if link := video_link(script_url):
+                links.append(link)
+    return links
+
+
+def parse_creative(url: str, data: dict[str, Any]) -> GoogleAd:
+    creative = data[CREATIVE]
+    _, _, region = parse_creative_url(url)
+    format_value = FORMATS.get(creative.get(FORMAT))
+
+    # The versioned ads trigger only keeps ads that have every one of these
+    first_shown = parse_timestamp(creative.get(FIRST_SHOWN))
+    last_shown = parse_timestamp(creative.get(LAST_SHOWN))
+    properties = [
+        {"label": "last_shown", "value": format_date(last_shown)},
+        {"label": "first_shown", "value": format_date(first_shown)},
+        {"label": "ran_for", "value": format_ran_for(first_shown, last_shown)},
+        {"label": "format", "value": format_value},
+    ]
+    advertiser_id = creative.get(ADVERTISER_ID)
+    return GoogleAd.model_validate(
+        {
+            "advertisement_url": url,
+            "advertiser_name": creative.get(ADVERTISER_NAME),
+            "advertiser_url": (
+                ADVERTISER_URL.format(advertiser_id=advertiser_id, region=region)
+                if advertiser_id
+                else None
+            ),
+            "properties": [prop for prop in properties if prop["value"] is not None],
+            "age_targeting": None,
+            "gender_targeting": None,
+            "geo_targeting": None,
+            "media_links": media_links(format_value, creative.get(VARIATIONS) or []),
+        }
+    )
+
+
+def complete_ad(ad: GoogleAd) -> bool:
+    """Whether ``ad`` has everything the browser scraper would have written.
+
+    Upserts overwrite the scraper's rows, so an ad the RPC parsing only
+    partly understood is skipped rather than written.
+    """
+    labels = {prop.label for prop in ad.properties or []}
+    return bool(ad.advertiser_name and ad.advertiser_url) and {
+        "first_shown",
+        "last_shown",
+        "ran_for",
+        "format",
+    } <= labels
+
+
+def fetch_ad(url: str) -> GoogleAd | None:
+    """Browserless counterpart of scrape_ad_data_from_url."""
+    try:
+        return parse_creative(url, fetch_creative(*parse_creative_url(url)))
+    except Exception as e:
+        print(f"Error fetching ad ({url}):", type(e), e)
+        return None
+
+
+def record_fixture(url: str, directory: str) -> str:
+    """Save the RPC response for ``url`` next to what the browser scraper makes of it.
+
+    The preview scripts of video creatives are saved too, so the fixture
+    replays without the network. Returns the path written.
+    """
+    from driver_pool import create_driver
+    from scrape_google_ads import scrape_ad_data_from_url
+
+    advertiser_id, creative_id, region = parse_creative_url(url)
+    response = fetch_creative(advertiser_id, creative_id, region)
+    preview_scripts = {}
+    for variation in response[CREATIVE].get(VARIATIONS) or []:
+        if script_url := nested(variation, PREVIEW_SCRIPT):
+            script = get_session().get(script_url, timeout=REQUEST_TIMEOUT_SECONDS)
+            script.raise_for_status()
+            preview_scripts[script_url] = script.text
+
+    driver = create_driver()
+    try:
+        expected = scrape_ad_data_from_url(url, driver)
+    finally:
+        driver.quit()
+    if expected is None:
+        raise RuntimeError(f"The browser scraper couldn't read {url}")
+
+    path = os.path.join(directory, f"{creative_id}.json")
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "url": url,
+                "response": response,
+                "preview_scripts": preview_scripts,
+                "expected": expected.model_dump(mode="json"),
+            },
+            f,
+            indent=2,
+        )
+    return path
+
+
+def get_ad_links() -> list[str]:
+    supabase_client = get_supabase_client()
+    links = []
+    chunk_size = 1000
+    start = 0
+    while True:
+        response = (
+            supabase_client.table("stg_ads__google_ads_links")
+            .select("advertisement_url")
+            .order("updated_at", desc=False)
+            .range(start, start + chunk_size - 1)
+            .execute()
+        )
+        links.extend(item["advertisement_url"] for item in response.data)
+        if len(response.data) < chunk_size:
+            break
+        start += chunk_size
+    return links
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fetch Google ad details from the transparency center without a browser"
+    )
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument(
+        "--record",
+        metavar="DIR",
+        help="Save test fixtures for the given creative URLs instead of fetching every stored link",
+    )
+    parser.add_argument("urls", nargs="*")
+    args = parser.parse_args()
+
+    if args.record:
+        for url in args.urls:
+            print("Recorded", record_fixture(url, args.record))
+        sys.exit(0)
+
+    links = get_ad_links()
+    print("Got", len(links), "links")
+    get_session(pool_size=args.workers)
+
+    writer = BatchWriter("stg_ads__google_ads", on_conflict="advertisement_url")
+    deferred = 0
+    unparsed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for ad in tqdm(executor.map(fetch_ad, links), total=len(links), desc="Fetching ads"):
+                if ad is None:
+                    continue
+                if not complete_ad(ad):
+                    unparsed += 1
+                    continue
+                if ad.media_links is None:
+                    deferred += 1
+                    continue
+                writer.put([ad.model_dump(mode="json", include=FETCHED_COLUMNS)])
+    finally:
+        writer.close()
+    print(deferred, "text ads left for the browser scraper")
+    print(unparsed, "ads skipped with missing fields")
@@ -3,17 +3,13 @@ import os
 import time
 from typing import Any
 from dotenv import load_dotenv
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.remote.webelement import WebElement
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from tqdm import tqdm
-from webdriver_manager.chrome import ChromeDriverManager
 import re
 from urllib.parse import urlparse
 import traceback
@@ -21,6 +17,7 @@ import multiprocessing as mp
 
 import supabase
 
+from driver_pool import get_driver, get_driver_path, init_worker
 from models import GoogleAd
 
 # Load environment variables
@@ -35,15 +32,6 @@ def get_supabase_client():
     )
 
 
-def create_driver() -> WebDriver:
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()), options=chrome_options
-    )
-    return driver
-
-
 def get_ads_from_db():
     supabase_client = get_supabase_client()
     ads: list[GoogleAd] = []
@@ -66,7 +54,7 @@ def get_ads_from_db():
 
 def scrape_ad_stats(ad: GoogleAd):
     try:
-        driver = create_driver()
+        driver = get_driver()
         driver.get(ad.advertisement_url.unicode_string())
         WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.CLASS_NAME, "overview-stats"))
@@ -105,9 +93,6 @@ def scrape_ad_stats(ad: GoogleAd):
     except Exception as e:
         print(f"Error with ad ({ad.advertisement_url}):", type(e), e)
         return None
-    finally:
-        if driver is not None:
-            driver.quit()
 
 
 if __name__ == "__main__":
@@ -125,7 +110,9 @@ if __name__ == "__main__":
                 )
             pbar.update(1)
 
-        with mp.Pool(mp.cpu_count()) as p:
+        with mp.Pool(
+            mp.cpu_count(), initializer=init_worker, initargs=(get_driver_path(),)
+        ) as p:
             for ad in ads:
                 # print("Scraping ad:", ad.advertisement_url)
                 p.apply_async(scrape_ad_stats, args=(ad,), callback=update_progress)
@@ -3,16 +3,12 @@ import os
 import time
 from typing import Any
 from dotenv import load_dotenv
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.remote.webelement import WebElement
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 import re
 from urllib.parse import urlparse
 import traceback
@@ -20,6 +16,7 @@ import multiprocessing as mp
 
 import supabase
 
+from driver_pool import create_driver, get_driver, get_driver_path, init_worker
 from models import GoogleAd
 
 # Load environment variables
@@ -34,13 +31,26 @@ def get_supabase_client():
     )
 
 
-def create_driver() -> WebDriver:
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()), options=chrome_options
-    )
-    return driver
+# Previews are only ever appended as the page scrolls, so everything before
+# index arguments[0] has already been read. The cursor moves past the last
+# preview with a link: trailing previews whose link hasn't rendered yet are
+# read again next pass, while a linkless preview followed by linked ones
+# (a removed ad, say) is skipped rather than holding up the rest
+HARVEST_NEW_LINKS_SCRIPT = """
+window.scrollBy(0, document.body.scrollHeight);
+window.scrollBy(0, -100);
+const previews = document.getElementsByTagName("creative-preview");
+const hrefs = [];
+let next = arguments[0];
+for (let i = arguments[0]; i < previews.length; i++) {
+    const link = previews[i].querySelector("a");
+    if (link) {
+        hrefs.push(link.href);
+        next = i + 1;
+    }
+}
+return [next, hrefs];
+"""
 
 
 def scrape_ad_links():
@@ -57,9 +67,9 @@ def scrape_ad_links():
             EC.presence_of_all_elements_located((By.TAG_NAME, "creative-preview"))
         )
 
-        creative_previews = []
         num_iterations = 1000
-        prev_len = 0
+        seen_previews = 0
+        link_set: set[str] = set()
 
         response = (
             supabase_client.table("stg_ads__google_ads_links")
@@ -77,53 +87,43 @@ def scrape_ad_links():
             latest_link = response["data"]["advertisement_url"]
 
         for _ in range(num_iterations):
-            prev_len = len(creative_previews)
-            # Scroll to the bottom
-            # Scroll down by a smaller amount to avoid going too far
-            # Scroll to the bottom, then slightly up to trigger infinite scroll
-            driver.execute_script(
-                "window.scrollBy(0, document.body.scrollHeight);"
-                "window.scrollBy(0, -100);"
-            )
-            # Wait a short time for content to load
-            # time.sleep(1)
-            # Get all elements with the tag name 'creative-preview'
-            creative_previews = driver.find_elements(By.TAG_NAME, "creative-preview")
-
-            link_set = set(
-                map(
-                    lambda preview: preview.find_element(
-                        By.TAG_NAME, "a"
-                    ).get_attribute("href"),
-                    creative_previews,
-                )
+            # Scroll to the bottom, then slightly up to trigger infinite scroll,
+            # and read the hrefs of the previews added since the last pass
+            seen_previews, hrefs = driver.execute_script(
+                HARVEST_NEW_LINKS_SCRIPT, seen_previews
             )
 
-            all_links = list(link_set)
+            new_links = list(
+                dict.fromkeys(href for href in hrefs if href not in link_set)
+            )
+            link_set.update(new_links)
+            all_links.extend(new_links)
 
             size = 200
-            for chunk in range(0, len(all_links), size):
+            for chunk in range(0, len(new_links), size):
                 supabase_client.table("stg_ads__google_ads_links").upsert(
                     list(
                         map(
                             lambda url: {"advertisement_url": url},
-                            all_links[chunk : chunk + size],
+                            new_links[chunk : chunk + size],
                         )
                     )
                 ).execute()
 
-            if len(creative_previews) > 10000:
+            if seen_previews > 10000:
                 print("Exceeded 10000 links")
                 break
             elif latest_link is not None and latest_link in link_set:
                 print("Added all latest ad links")
                 break
 
-            print("Accumulated to", len(creative_previews), "links")
+            print("Accumulated to", seen_previews, "links")
     except TimeoutException:
         print(
             "Timed out waiting for elements with tag 'creative-preview' to be present."
         )
+    finally:
+        driver.quit()
 
     # print(*all_links, sep="\n")
     print("Got", len(all_links), "links")
@@ -167,19 +167,19 @@ def scrape_ads_from_supabase_urls():
     n_cores = mp.cpu_count()
     n_cores = 10
     print("Number of cores available:", n_cores)
-    with mp.Pool(processes=n_cores) as pool:
+    with mp.Pool(
+        processes=n_cores, initializer=init_worker, initargs=(get_driver_path(),)
+    ) as pool:
         pool.map(scrape_helper, links)
-
-
-driver = create_driver()
+        # Let the workers exit on their own so they quit their browsers
+        pool.close()
+        pool.join()
 
 
 def scrape_helper(url):
-    global driver
     supabase_client = get_supabase_client()
     print("Starting", url)
-    # driver = create_driver()
-    data = scrape_ad_data_from_url(url, driver)
+    data = scrape_ad_data_from_url(url, get_driver())
     if data is None:
         return
     jsn: dict[str, Any] = data.model_dump(mode="json")
@@ -190,13 +190,12 @@ def scrape_helper(url):
         ).execute()
     except Exception as e:
         print("Supabase couldn't upsert:", e)
-    # driver.quit()
 
 
 def scrape_ad_data_from_url(url: str, driver: WebDriver | None = None):
     try:
         if driver is None:
-            driver = webdriver.Chrome()
+            driver = create_driver()
 
         ad_details: dict[str, Any] = {"advertisement_url": url}
         driver.get(url)
@@ -466,7 +465,6 @@ def find_youtube_link(driver: WebDriver):
 if __name__ == "__main__":
     # scrape_ad_links()
     scrape_ads_from_supabase_urls()
-    driver.quit()
 
 # for url in all_links:
 #     print(scrape_ad_data_from_url(driver, url))
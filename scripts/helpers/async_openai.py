@@ -0,0 +1,127 @@
+import asyncio
+import os
+import traceback
+from typing import AsyncIterable, Awaitable, Callable, Iterable, TypeVar
+
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+from scripts.helpers.rate_limit import (
+    acquire_for_request,
+    acquire_for_request_sync,
+    record_for_response,
+    record_for_response_sync,
+)
+
+load_dotenv(".env.local")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Requests kept in flight at once. The enrichment work is network-bound, so
+# this can be far higher than the number of cores
+DEFAULT_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "200"))
+
+# Retries after a 429 wait for the shared rate limiter rather than a fixed
+# backoff, so a generous budget doesn't cause retry storms
+MAX_RETRIES = 6
+
+_client: AsyncOpenAI | None = None
+_sync_client: OpenAI | None = None
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Shared AsyncOpenAI client, reused so every request draws on one connection pool.
+
+    Every request, including the SDK's own retries, first waits for the
+    cross-process rate limiter, and every response updates it. The client
+    is bound to the event loop it is first used in, so each script should
+    do all of its OpenAI work inside a single ``asyncio.run``.
+    """
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=MAX_RETRIES,
+            http_client=DefaultAsyncHttpxClient(
+                event_hooks={
+                    "request": [acquire_for_request],
+                    "response": [record_for_response],
+                }
+            ),
+        )
+    return _client
+
+
+def get_openai_client() -> OpenAI:
+    """Shared sync client, drawing on the same rate limiter as the async one.
+
+    Scripts that fan out over process pools use this, so each worker
+    process gets its own client the first time it makes a request.
+    """
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=MAX_RETRIES,
+            http_client=DefaultHttpxClient(
+                event_hooks={
+                    "request": [acquire_for_request_sync],
+                    "response": [record_for_response_sync],
+                }
+            ),
+        )
+    return _sync_client
+
+
+async def run_bounded(
+    func: Callable[[T], Awaitable[R]],
+    items: Iterable[T] | AsyncIterable[T],
+    callback: Callable[[R], None] | None = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> int:
+    """Run ``func`` over ``items`` with at most ``concurrency`` calls in flight.
+
+    This replaces ``Pool.apply_async``: a fixed set of workers pulls items
+    lazily, and ``callback`` receives each result. Callbacks run in a thread
+    so blocking database writes don't stall the requests still in flight.
+    A failing item is reported and skipped. Returns the number of items
+    that failed, so callers can hold back steps that assume every item
+    went through.
+
+    ``items`` may be an async iterable, so sources that do blocking I/O
+    between items can run it in a thread instead of on the event loop.
+    """
+    done = object()
+    failures = 0
+
+    if isinstance(items, AsyncIterable):
+        async_iterator = aiter(items)
+        # An async generator can't be advanced by two workers at once
+        lock = asyncio.Lock()
+
+        async def next_item():
+            async with lock:
+                return await anext(async_iterator, done)
+
+    else:
+        iterator = iter(items)
+
+        async def next_item():
+            # Safe to share: nothing awaits between the iterator's next() calls
+            return next(iterator, done)
+
+    async def worker():
+        nonlocal failures
+        while (item := await next_item()) is not done:
+            try:
+                result = await func(item)
+                if callback is not None:
+                    await asyncio.to_thread(callback, result)
+            except Exception as e:
+                failures += 1
+                print(f"Error processing item: {e}")
+                traceback.print_exc()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return failures
@@ -0,0 +1,129 @@
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Callable
+
+import httpx
+from postgrest.exceptions import APIError
+
+from scripts.helpers.helpers import get_supabase_client
+
+DEFAULT_WRITERS = 2
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_SECONDS = 2.0
+
+# Rows buffered ahead of the writers before producers start blocking
+DEFAULT_MAX_PENDING_ROWS = 10_000
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 1.0
+
+# Failures that guarantee nothing was committed: the server rejected the
+# write, or the request never left
+UNCOMMITTED_ERRORS = (APIError, httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class BatchWriter:
+    """Insert rows into a table from dedicated writer threads.
+
+    Rows go through a bounded queue, so ``put`` blocks producers once the
+    writers fall behind. Each writer flushes a batch once it holds
+    ``batch_size`` rows or ``flush_seconds`` after its first row, whichever
+    comes first. Failed writes are retried with jittered exponential
+    backoff. Rows that still fail are counted, and ``close`` raises if any
+    were lost.
+
+    With ``on_conflict`` set, batches are upserted on those columns, which
+    makes every retry safe. Plain inserts are only retried when the failure
+    shows nothing was committed, since retrying after a dropped connection
+    could insert the batch twice.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        writers: int = DEFAULT_WRITERS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+        max_pending_rows: int = DEFAULT_MAX_PENDING_ROWS,
+        on_written: Callable[[int], None] | None = None,
+        on_conflict: str | None = None,
+    ):
+        self.table = table
+        self.on_conflict = on_conflict
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.on_written = on_written
+        self.queue = queue.Queue(maxsize=max_pending_rows)
+        self.lock = threading.Lock()
+        self.failed_rows = 0
+        self.threads = [
+            threading.Thread(target=self.run, name=f"{table}-writer-{index}", daemon=True)
+            for index in range(writers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, rows: list[dict]):
+        for row in rows:
+            self.queue.put(row)
+
+    def run(self):
+        supabase_client = get_supabase_client()
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                row = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                # Nothing arrived before the deadline, flush the partial batch
+                self.write(supabase_client, batch)
+                batch, deadline = [], None
+                continue
+            if row is None:  # None is the signal to stop
+                self.write(supabase_client, batch)
+                return
+            batch.append(row)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_seconds
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self.write(supabase_client, batch)
+                batch, deadline = [], None
+
+    def write(self, supabase_client, batch: list[dict]):
+        if not batch:
+            return
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                query = supabase_client.table(self.table)
+                if self.on_conflict is None:
+                    query.insert(batch).execute()
+                else:
+                    query.upsert(batch, on_conflict=self.on_conflict).execute()
+                break
+            except Exception as e:
+                if attempt == MAX_ATTEMPTS - 1 or not self.can_retry(e):
+                    logging.error(f"Giving up on {len(batch)} rows for {self.table}: {e}")
+                    with self.lock:
+                        self.failed_rows += len(batch)
+                    return
+                delay = BACKOFF_SECONDS * 2**attempt * random.uniform(0.5, 1.5)
+                logging.warning(f"Write to {self.table} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+        if self.on_written is not None:
+            self.on_written(len(batch))
+
+    def can_retry(self, error: Exception) -> bool:
+        return self.on_conflict is not None or isinstance(error, UNCOMMITTED_ERRORS)
+
+    def close(self):
+        """Flush everything still queued and stop the writers."""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.failed_rows:
+            raise RuntimeError(f"{self.failed_rows} rows could not be written to {self.table}")
@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import TypeVar
+
+from pydantic import BaseModel
+
+from scripts.helpers.async_openai import get_async_openai_client, get_openai_client
+
+T = TypeVar("T", bound=BaseModel)
+
+COMPLETION_CACHE_PATH = os.getenv(
+    "COMPLETION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), ".completion_cache.sqlite3"),
+)
+COMPLETION_CACHE_TTL_SECONDS = float(os.getenv("COMPLETION_CACHE_TTL_DAYS", "30")) * 24 * 3600
+
+# Bump to invalidate every cached completion at once
+COMPLETION_CACHE_VERSION = 1
+
+
+def schema_fingerprint(response_format: type[BaseModel]) -> str:
+    """Hash of a response model's JSON schema, so any field or enum edit changes it."""
+    schema = json.dumps(response_format.model_json_schema(), sort_keys=True)
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()
+
+
+def completion_key(
+    model: str,
+    messages: list[dict],
+    response_format: type[BaseModel],
+    version: str,
+    options: dict,
+) -> str:
+    """Cache key covering everything that determines a parsed completion.
+
+    The messages carry the system prompt and user content, so editing a
+    prompt or schema only misses for the calls that use it.
+    """
+    key = json.dumps(
+        {
+            "cache_version": COMPLETION_CACHE_VERSION,
+            "version": version,
+            "model": model,
+            "messages": [[message["role"], message["content"]] for message in messages],
+            "schema": schema_fingerprint(response_format),
+            "options": options,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """On-disk cache of parsed structured completions, stored as JSON.
+
+    Entries older than ``ttl`` seconds are ignored and purged when the cache
+    is first opened in a process.
+    """
+
+    def __init__(self, path: str = COMPLETION_CACHE_PATH, ttl: float = COMPLETION_CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if getattr(self.local, "connection", None) is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    response_format TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                "DELETE FROM completions WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+            self.local.connection = connection
+        return self.local.connection
+
+    def get(self, key: str, response_format: type[T]) -> T | None:
+        row = self.connection.execute(
+            "SELECT result FROM completions WHERE key = ? AND created_at >= ?",
+            (key, time.time() - self.ttl),
+        ).fetchone()
+        return response_format.model_validate_json(row[0]) if row else None
+
+    def put(self, key: str, result: BaseModel):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO completions (key, response_format, result, created_at) VALUES (?, ?, ?, ?)",
+            (key, type(result).__name__, result.model_dump_json(), time.time()),
+        )
+
+
+_cache: CompletionCache | None = None
+
+
+def get_completion_cache() -> CompletionCache:
+    global _cache
+    if _cache is None:
+        _cache = CompletionCache()
+    return _cache
+
+
+def parse_completion(
+    messages: list[dict],
+    response_format: type[T],
+    model: str = "gpt-4o-mini",
+    version: str = "",
+    **options,
+) -> T | None:
+    """Cached ``beta.chat.completions.parse``, returning the parsed message.
+
+    Refusals return None and are not cached. Pass a new ``version`` to
+    invalidate a caller's entries when something outside the prompt and
+    schema changes, such as how the result is post-processed.
+    """
+    cache = get_completion_cache()
+    key = completion_key(model, messages, response_format, version, options)
+    if (cached := cache.get(key, response_format)) is not None:
+        return cached
+    response = get_openai_client().beta.chat.completions.parse(
+        model=model, messages=messages, response_format=response_format, **options
+    )
+    return store_parsed(cache, key, response.choices[0].message)
+
+
+async def parse_completion_async(
+    messages: list[dict],
+    response_format: type[T],
+    model: str = "gpt-4o-mini",
+    version: str = "",
+    **options,
+) -> T | None:
+    """Async counterpart of parse_completion, using the shared AsyncOpenAI client.
+
+    Cache reads and writes run in a thread, since SQLite can block on
+    another process's write lock.
+    """
+    cache = get_completion_cache()
+    key = completion_key(model, messages, response_format, version, options)
+    if (cached := await asyncio.to_thread(cache.get, key, response_format)) is not None:
+        return cached
+    response = await get_async_openai_client().beta.chat.completions.parse(
+        model=model, messages=messages, response_format=response_format, **options
+    )
+    return await asyncio.to_thread(store_parsed, cache, key, response.choices[0].message)
+
+
+def store_parsed(cache: CompletionCache, key: str, message) -> BaseModel | None:
+    if message.parsed is None:
+        print("OpenAI API refusal:", message.refusal)
+        return None
+    cache.put(key, message.parsed)
+    return message.parsed
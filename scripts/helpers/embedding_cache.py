@@ -0,0 +1,140 @@
+from array import array
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# Shared by every script on this machine; delete the file to start over
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), ".embedding_cache.sqlite3"),
+)
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
+# SQLite limits the number of bound parameters per statement
+QUERY_CHUNK_SIZE = 500
+EVICTION_BATCH_SIZE = 1000
+
+# Summing the cache size scans the table, so only check it every so many writes
+EVICTION_CHECK_INTERVAL = 100
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC, with whitespace runs collapsed."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk embedding cache keyed by model and normalized text.
+
+    Embeddings are stored as float32 blobs. Once the stored blobs exceed
+    ``max_bytes``, the least recently used entries are evicted. The database
+    runs in WAL mode so several processes can share it, and each thread gets
+    its own connection.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.local = threading.local()
+        self.writes_since_eviction = EVICTION_CHECK_INTERVAL
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if getattr(self.local, "connection", None) is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used_idx ON embeddings (last_used)"
+            )
+            self.local.connection = connection
+        return self.local.connection
+
+    def get_many(self, model: str, texts: list[str | None]) -> list[list[float] | None]:
+        """Cached embeddings for ``texts``, with None for misses and blank texts."""
+        keys = [cache_key(model, text) if text and text.strip() else None for text in texts]
+        unique_keys = list({key for key in keys if key is not None})
+        found: dict[str, list[float]] = {}
+        for start in range(0, len(unique_keys), QUERY_CHUNK_SIZE):
+            chunk = unique_keys[start : start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+            if rows:
+                self.connection.execute(
+                    f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                    [time.time(), *(key for key, _ in rows)],
+                )
+        return [found.get(key) if key is not None else None for key in keys]
+
+    def put_many(self, model: str, embeddings: dict[str, list[float]]):
+        """Store embeddings by their source text, then evict down to the size bound."""
+        now = time.time()
+        rows = []
+        for text, embedding in embeddings.items():
+            if embedding is not None:
+                blob = array("f", embedding).tobytes()
+                rows.append((cache_key(model, text), model, blob, len(blob), now))
+        if not rows:
+            return
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, model, embedding, size, last_used) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        self.writes_since_eviction += 1
+        if self.writes_since_eviction >= EVICTION_CHECK_INTERVAL:
+            self.writes_since_eviction = 0
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the stored blobs fit in ``max_bytes``."""
+        (total,) = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM embeddings"
+        ).fetchone()
+        while total > self.max_bytes:
+            oldest = self.connection.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_used LIMIT ?",
+                (EVICTION_BATCH_SIZE,),
+            ).fetchall()
+            if not oldest:
+                break
+            evicted = []
+            for key, size in oldest:
+                evicted.append(key)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+            self.connection.execute(
+                f"DELETE FROM embeddings WHERE key IN ({','.join('?' * len(evicted))})", evicted
+            )
+
+
+_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache()
+    return _cache
@@ -0,0 +1,114 @@
+import asyncio
+
+from scripts.helpers.async_openai import get_async_openai_client, get_openai_client
+from scripts.helpers.embedding_cache import get_embedding_cache
+from scripts.helpers.rate_limit import CHARS_PER_TOKEN
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# The embeddings endpoint accepts up to 2048 inputs and 300k tokens per
+# request; stay below the token limit to absorb estimation error
+MAX_BATCH_INPUTS = 2048
+MAX_BATCH_TOKENS = 250_000
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_batches(
+    texts: list[str],
+    max_tokens: int = MAX_BATCH_TOKENS,
+    max_inputs: int = MAX_BATCH_INPUTS,
+) -> list[list[int]]:
+    """Split texts into consecutive batches of indices that fit in one request."""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for index, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (
+            current_tokens + tokens > max_tokens or len(current) >= max_inputs
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def find_uncached(
+    texts: list[str], model: str
+) -> tuple[list[list[float] | None], list[str]]:
+    """Cached embeddings for texts, plus the distinct texts still to be embedded.
+
+    Blank texts, which the API rejects, are never embedded and stay None.
+    """
+    embeddings = get_embedding_cache().get_many(model, texts)
+    uncached = list(
+        dict.fromkeys(
+            text
+            for text, embedding in zip(texts, embeddings)
+            if embedding is None and text and text.strip()
+        )
+    )
+    return embeddings, uncached
+
+
+def fill_from_fetched(
+    texts: list[str],
+    embeddings: list[list[float] | None],
+    fetched: dict[str, list[float]],
+    model: str,
+) -> list[list[float] | None]:
+    """Cache freshly fetched embeddings and merge them in, preserving order."""
+    get_embedding_cache().put_many(model, fetched)
+    return [
+        embedding if embedding is not None else fetched.get(text)
+        for text, embedding in zip(texts, embeddings)
+    ]
+
+
+def embed_texts(
+    texts: list[str], model: str = EMBEDDING_MODEL
+) -> list[list[float] | None]:
+    """Embed many texts with as few requests as possible, preserving order.
+
+    Texts already in the on-disk embedding cache are not sent again.
+    Blank texts, which the API rejects, get None instead of an embedding.
+    """
+    embeddings, uncached = find_uncached(texts, model)
+    fetched: dict[str, list[float]] = {}
+    for batch in pack_batches(uncached):
+        response = get_openai_client().embeddings.create(
+            input=[uncached[index] for index in batch], model=model
+        )
+        for item in response.data:
+            fetched[uncached[batch[item.index]]] = item.embedding
+    return fill_from_fetched(texts, embeddings, fetched, model)
+
+
+async def embed_texts_async(
+    texts: list[str], model: str = EMBEDDING_MODEL
+) -> list[list[float] | None]:
+    """Async counterpart of embed_texts, using the shared AsyncOpenAI client."""
+    client = get_async_openai_client()
+    # SQLite can block on another process's write lock, so keep it off the loop
+    embeddings, uncached = await asyncio.to_thread(find_uncached, texts, model)
+    fetched: dict[str, list[float]] = {}
+    for batch in pack_batches(uncached):
+        response = await client.embeddings.create(
+            input=[uncached[index] for index in batch], model=model
+        )
+        for item in response.data:
+            fetched[uncached[batch[item.index]]] = item.embedding
+    return await asyncio.to_thread(fill_from_fetched, texts, embeddings, fetched, model)
+
+
+async def embed_text_async(
+    text: str | None, model: str = EMBEDDING_MODEL
+) -> list[float] | None:
+    """Embed a single text, returning None for blank input."""
+    return (await embed_texts_async([text or ""], model))[0]
@@ -0,0 +1,182 @@
+import asyncio
+import fcntl
+import json
+import os
+import random
+import tempfile
+import time
+
+import httpx
+
+# Limits assumed for a model until its first response reports the real ones
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_RPM", "500"))
+DEFAULT_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TPM", "200000"))
+
+# Completion tokens charged up front for chat requests without max_tokens
+DEFAULT_COMPLETION_TOKENS = 500
+
+# Pause after a 429 that doesn't say how long to wait
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+
+# Every process on this machine shares the buckets kept here
+RATE_LIMIT_DIR = os.getenv(
+    "OPENAI_RATE_LIMIT_DIR",
+    os.path.join(tempfile.gettempdir(), "lightspeed_openai_rate_limits"),
+)
+
+# Conservative characters-per-token ratio for English text
+CHARS_PER_TOKEN = 3
+
+
+def estimate_request_tokens(request: httpx.Request) -> tuple[str, int]:
+    """Model and estimated token cost of an OpenAI API request.
+
+    The whole JSON body (prompt, inputs and any response schema) is counted,
+    plus the completion allowance for chat requests, so the estimate errs high.
+    """
+    try:
+        body = json.loads(request.content or b"{}")
+    except ValueError:
+        body = {}
+    tokens = len(request.content or b"") // CHARS_PER_TOKEN + 1
+    if request.url.path.endswith("/chat/completions"):
+        tokens += (
+            body.get("max_completion_tokens")
+            or body.get("max_tokens")
+            or DEFAULT_COMPLETION_TOKENS
+        )
+    return body.get("model", "default"), tokens
+
+
+class RateLimiter:
+    """Token bucket for one model's requests and tokens per minute.
+
+    The bucket state lives in a small file guarded by an exclusive lock, so
+    every process on the machine spends the same quota. Levels are pulled
+    down to the ``x-ratelimit-remaining-*`` values the API reports, and a 429
+    empties both buckets so all callers wait out the ``retry-after`` together
+    instead of retrying in lockstep.
+    """
+
+    def __init__(self, model: str):
+        os.makedirs(RATE_LIMIT_DIR, exist_ok=True)
+        self.path = os.path.join(RATE_LIMIT_DIR, f"{model.replace('/', '_')}.json")
+
+    def _update(self, change):
+        """Apply ``change`` to the refilled bucket state under the file lock."""
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read()
+                now = time.time()
+                state = json.loads(content) if content else {
+                    "request_limit": DEFAULT_REQUESTS_PER_MINUTE,
+                    "token_limit": DEFAULT_TOKENS_PER_MINUTE,
+                    "requests": DEFAULT_REQUESTS_PER_MINUTE,
+                    "tokens": DEFAULT_TOKENS_PER_MINUTE,
+                    "updated": now,
+                    "blocked_until": 0.0,
+                }
+                elapsed = max(now - state["updated"], 0.0)
+                state["requests"] = min(
+                    state["request_limit"],
+                    state["requests"] + elapsed * state["request_limit"] / 60,
+                )
+                state["tokens"] = min(
+                    state["token_limit"],
+                    state["tokens"] + elapsed * state["token_limit"] / 60,
+                )
+                state["updated"] = now
+                result = change(state, now)
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take one request and ``tokens`` from the buckets, or return the seconds to wait."""
+
+        def take(state, now):
+            if state["blocked_until"] > now:
+                return state["blocked_until"] - now
+            # A request larger than the whole bucket only has to wait for a full one
+            tokens_needed = min(tokens, state["token_limit"])
+            if state["requests"] >= 1 and state["tokens"] >= tokens_needed:
+                state["requests"] -= 1
+                state["tokens"] -= tokens_needed
+                return 0.0
+            return max(
+                (1 - state["requests"]) * 60 / state["request_limit"],
+                (tokens_needed - state["tokens"]) * 60 / state["token_limit"],
+            )
+
+        return self._update(take)
+
+    async def acquire(self, tokens: int):
+        # The file lock blocks, so take it off the event loop
+        while (wait := await asyncio.to_thread(self._try_acquire, tokens)) > 0:
+            # Jitter keeps waiting callers from waking all at once
+            await asyncio.sleep(wait * random.uniform(1.0, 1.2))
+
+    def acquire_sync(self, tokens: int):
+        while (wait := self._try_acquire(tokens)) > 0:
+            time.sleep(wait * random.uniform(1.0, 1.2))
+
+    def record_response(self, response: httpx.Response):
+        """Adapt the buckets to the limits the API reports on a response."""
+        headers = response.headers
+
+        def adapt(state, now):
+            if limit := headers.get("x-ratelimit-limit-requests"):
+                state["request_limit"] = float(limit)
+            if limit := headers.get("x-ratelimit-limit-tokens"):
+                state["token_limit"] = float(limit)
+            if remaining := headers.get("x-ratelimit-remaining-requests"):
+                state["requests"] = min(state["requests"], float(remaining))
+            if remaining := headers.get("x-ratelimit-remaining-tokens"):
+                state["tokens"] = min(state["tokens"], float(remaining))
+            if response.status_code == 429:
+                try:
+                    retry_after = float(headers.get("retry-after", ""))
+                except ValueError:
+                    retry_after = DEFAULT_RETRY_AFTER_SECONDS
+                state["requests"] = state["tokens"] = 0.0
+                state["blocked_until"] = max(state["blocked_until"], now + retry_after)
+
+        self._update(adapt)
+
+
+_limiters: dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(model: str) -> RateLimiter:
+    if model not in _limiters:
+        _limiters[model] = RateLimiter(model)
+    return _limiters[model]
+
+
+async def acquire_for_request(request: httpx.Request):
+    """httpx request hook: wait until the request fits in its model's rate limits."""
+    model, tokens = estimate_request_tokens(request)
+    await get_rate_limiter(model).acquire(tokens)
+
+
+async def record_for_response(response: httpx.Response):
+    """httpx response hook: feed the rate limit headers back into the limiter."""
+    model, _ = estimate_request_tokens(response.request)
+    await asyncio.to_thread(get_rate_limiter(model).record_response, response)
+
+
+def acquire_for_request_sync(request: httpx.Request):
+    """Blocking counterpart of acquire_for_request, for the sync client."""
+    model, tokens = estimate_request_tokens(request)
+    get_rate_limiter(model).acquire_sync(tokens)
+
+
+def record_for_response_sync(response: httpx.Response):
+    """Blocking counterpart of record_for_response, for the sync client."""
+    model, _ = estimate_request_tokens(response.request)
+    get_rate_limiter(model).record_response(response)
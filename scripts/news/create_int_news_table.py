@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 import json
 from uuid import uuid4
-from multiprocessing import Pool, Queue, cpu_count
+import asyncio
 from tqdm import tqdm
 import openai
 from models import (
@@ -10,21 +10,13 @@ from models import (
     NewsValidationResponse,
     RawArticle,
 )
+from scripts.helpers.async_openai import run_bounded
+from scripts.helpers.completion_cache import parse_completion_async
+from scripts.helpers.embeddings import embed_text_async
 from scripts.helpers.helpers import get_supabase_client
-from tenacity import (
-    retry,
-    wait_exponential,
-    stop_after_attempt,
-    retry_if_exception_type,
-)
 
 
-@retry(
-    retry=retry_if_exception_type(openai.RateLimitError),
-    wait=wait_exponential(multiplier=1, min=2, max=4),
-    stop=stop_after_attempt(6),
-)
-def validate_article_on_keywords(article: RawArticle) -> bool:
+async def validate_article_on_keywords(article: RawArticle) -> bool:
     try:
         if not article.publish_date:
             return False
@@ -33,20 +25,16 @@ def validate_article_on_keywords(article: RawArticle) -> bool:
         )
         if len(combined_keywords) == 0:
             return False
-        response: NewsValidationResponse = (
-            openai.beta.chat.completions.parse(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "We are building a political news aggregator and want to make sure that a news article that we are processing actually does relate to politics, government, or modern issues. You are given keywords that relate to a news article. Return a boolean of whether or not the article is relevant.",
-                    },
-                    {"role": "user", "content": str(combined_keywords)},
-                ],
-                response_format=NewsValidationResponse,
-            )
-            .choices[0]
-            .message.parsed
+        response: NewsValidationResponse = await parse_completion_async(
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "We are building a political news aggregator and want to make sure that a news article that we are processing actually does relate to politics, government, or modern issues. You are given keywords that relate to a news article. Return a boolean of whether or not the article is relevant.",
+                },
+                {"role": "user", "content": str(combined_keywords)},
+            ],
+            response_format=NewsValidationResponse,
         )
         return response.is_relevant
     except openai.RateLimitError as e:
@@ -55,29 +43,20 @@ def validate_article_on_keywords(article: RawArticle) -> bool:
         print("Error validating article on keywords:", e)
 
 
-@retry(
-    retry=retry_if_exception_type(openai.RateLimitError),
-    wait=wait_exponential(multiplier=1, min=2, max=4),
-    stop=stop_after_attempt(6),
-)
-def validate_article_on_content(article: RawArticle) -> bool:
+async def validate_article_on_content(article: RawArticle) -> bool:
     try:
         if not article.summary or not article.publish_date:
             return False
-        response: NewsValidationResponse = (
-            openai.beta.chat.completions.parse(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "We are building a political news aggregator and want to make sure that a news article that we are processing actually does relate to politics, government, or modern issues. You are given a summary of a news article. Return a boolean of whether or not the article is relevant.",
-                    },
-                    {"role": "user", "content": article.summary},
-                ],
-                response_format=NewsValidationResponse,
-            )
-            .choices[0]
-            .message.parsed
+        response: NewsValidationResponse = await parse_completion_async(
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "We are building a political news aggregator and want to make sure that a news article that we are processing actually does relate to politics, government, or modern issues. You are given a summary of a news article. Return a boolean of whether or not the article is relevant.",
+                },
+                {"role": "user", "content": article.summary},
+            ],
+            response_format=NewsValidationResponse,
         )
         return response.is_relevant
     except openai.RateLimitError as e:
@@ -86,40 +65,27 @@ def validate_article_on_content(article: RawArticle) -> bool:
         print("Error validating article on content:", e)
 
 
-@retry(
-    retry=retry_if_exception_type(openai.RateLimitError),
-    wait=wait_exponential(multiplier=1, min=2, max=4),
-    stop=stop_after_attempt(6),
-)
-def process_article(article: RawArticle) -> FilteredArticle:
+async def process_article(article: RawArticle) -> FilteredArticle:
     try:
         if (
             article is not None
-            # and validate_article_on_keywords(article)
-            and validate_article_on_content(article)
+            # and await validate_article_on_keywords(article)
+            and await validate_article_on_content(article)
         ):
-            response: NewsAISummary = (
-                openai.beta.chat.completions.parse(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are given a news article. Write a summary of at most four sentences summarizing the news article. Denote political keywords (broad voter concerns) that the news article mentions. If the article doesn't mention any political keywords (e.g. only a call to vote), return an empty list or return unknown. Denote the political leaning of the article. If the article doesn't lean any particular direction, return unknown. Denote one or more tones present in the article. If the article doesn't have a clear tone, return unknown. Compile a list of issues that contains more specific issues discussed by the article.",
-                        },
-                        {"role": "user", "content": f"{article.title}\n{article.text}"},
-                    ],
-                    response_format=NewsAISummary,
-                )
-                .choices[0]
-                .message.parsed
+            response: NewsAISummary = await parse_completion_async(
+                model="gpt-4o-mini",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are given a news article. Write a summary of at most four sentences summarizing the news article. Denote political keywords (broad voter concerns) that the news article mentions. If the article doesn't mention any political keywords (e.g. only a call to vote), return an empty list or return unknown. Denote the political leaning of the article. If the article doesn't lean any particular direction, return unknown. Denote one or more tones present in the article. If the article doesn't have a clear tone, return unknown. Compile a list of issues that contains more specific issues discussed by the article.",
+                    },
+                    {"role": "user", "content": f"{article.title}\n{article.text}"},
+                ],
+                response_format=NewsAISummary,
             )
 
-            summary_embedding: list[float] = (
-                openai.embeddings.create(
-                    input=response.ai_summary, model="text-embedding-3-small"
-                )
-                .data[0]
-                .embedding
+            summary_embedding: list[float] = await embed_text_async(
+                response.ai_summary
             )
 
             return FilteredArticle(
@@ -150,7 +116,7 @@ def get_articles_from_db() -> list[RawArticle]:
     return articles
 
 
-if __name__ == "__main__":
+async def main():
     articles = get_articles_from_db()
 
     with tqdm(total=len(articles), desc="Processing articles") as pbar:
@@ -163,11 +129,10 @@ if __name__ == "__main__":
                 ).execute()
             pbar.update(1)
 
-        with Pool(cpu_count()) as pool:
-            for article in articles:
-                pool.apply_async(process_article, args=(article,), callback=update)
-
-            pool.close()
-            pool.join()
+        await run_bounded(process_article, articles, update)
 
     print("All content processed successfully")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
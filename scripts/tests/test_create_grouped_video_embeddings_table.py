@@ -0,0 +1,74 @@
+import os
+import random
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from scripts.create_grouped_video_embeddings_table import (
+    sentence_block_starts,
+    soundbyte_arrays,
+)
+
+
+def old_sentence_block_starts(soundbytes):
+    """The datetime-based loop sentence_block_starts replaced, kept as the reference."""
+    block_starts = []
+    start_time = datetime.fromisoformat(soundbytes[0]["timestamp"])
+    start_index = 0
+    for idx, soundbyte in enumerate(soundbytes):
+        timestamp = datetime.fromisoformat(soundbyte["timestamp"])
+        block_length = (timestamp - start_time).total_seconds()
+        if (
+            block_length >= 60
+            or (block_length >= 10 and soundbyte["text"] and soundbyte["text"][-1] in ".!?")
+            or idx == len(soundbytes) - 1
+        ):
+            block_starts.append(start_index)
+            start_time, start_index = timestamp, idx + 1
+    return block_starts
+
+
+def make_soundbytes(offsets_ms, texts):
+    """Soundbytes as the page RPC returns them, plus the ISO timestamp the old loop read."""
+    return [
+        {
+            "id": index,
+            # EXTRACT(EPOCH ...) comes back as a decimal number of seconds
+            "start_seconds": float(f"{offset / 1000:.3f}"),
+            "duration_seconds": 1.0,
+            "timestamp": datetime.fromtimestamp(offset / 1000, tz=timezone.utc).isoformat(),
+            "text": text,
+        }
+        for index, (offset, text) in enumerate(zip(offsets_ms, texts))
+    ]
+
+
+def new_block_starts(soundbytes):
+    starts, _, ends_sentence = soundbyte_arrays(soundbytes)
+    return sentence_block_starts(starts, ends_sentence)[0].tolist()
+
+
+def test_sentence_closing_exactly_at_min_length():
+    # 1.12 + 10 is 11.120000000000001 in floats
+    soundbytes = make_soundbytes([1120, 5000, 11120, 13000], ["a", "b", "c.", "d"])
+    assert new_block_starts(soundbytes) == old_sentence_block_starts(soundbytes)
+    assert new_block_starts(soundbytes) == [0, 3]
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_old_loop_on_10ms_offsets(seed):
+    rng = random.Random(seed)
+    offset = rng.randrange(0, 100_000, 10)
+    offsets, texts = [], []
+    for _ in range(rng.randrange(1, 300)):
+        offsets.append(offset)
+        texts.append(rng.choice(["word", "end.", "what?", "", "wow!"]))
+        offset += rng.randrange(0, 8000, 10)
+    soundbytes = make_soundbytes(offsets, texts)
+    assert new_block_starts(soundbytes) == old_sentence_block_starts(soundbytes)
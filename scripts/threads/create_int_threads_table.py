@@ -2,7 +2,7 @@ from dataclasses import dataclass
 import json
 import re
 from uuid import uuid4
-from multiprocessing import Pool, Queue, cpu_count
+import asyncio
 from tqdm import tqdm
 import openai
 from news.models import (
@@ -12,13 +12,10 @@ from news.models import (
     RawArticle,
 )
 from helpers.helpers import get_supabase_client
-from tenacity import (
-    retry,
-    wait_exponential,
-    stop_after_attempt,
-    retry_if_exception_type,
-)
 
+from scripts.helpers.async_openai import run_bounded
+from scripts.helpers.completion_cache import parse_completion_async
+from scripts.helpers.embeddings import embed_text_async
 from scripts.threads.models import EnhancedIGThread, IGThreadAISummary, RawIGThread
 
 
@@ -26,30 +23,21 @@ def get_hashtags_from_text(text: str) -> list[str]:
     return re.findall(r"#\w+", text)
 
 
-@retry(
-    retry=retry_if_exception_type(openai.RateLimitError),
-    wait=wait_exponential(multiplier=1, min=2, max=4),
-    stop=stop_after_attempt(6),
-)
-def process_ig_thread(ig_thread: RawIGThread) -> EnhancedIGThread:
+async def process_ig_thread(ig_thread: RawIGThread) -> EnhancedIGThread:
     try:
         if not ig_thread.text:
             return
 
-        response: IGThreadAISummary = (
-            openai.beta.chat.completions.parse(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are given an Instagram Thread that someone posted on a political topic. Write a summary of at most three sentences summarizing the thread. Denote political keywords (broad voter concerns) that the news thread mentions. If the thread doesn't mention any political keywords (e.g. only a call to vote), return an empty list or return unknown. Denote the political leaning of the thread. If the thread doesn't lean any particular direction, return unknown. Denote one or more tones present in the thread. If the thread doesn't have a clear tone, return unknown. Compile a list of issues that contains more specific issues discussed by the article.",
-                    },
-                    {"role": "user", "content": ig_thread.text},
-                ],
-                response_format=IGThreadAISummary,
-            )
-            .choices[0]
-            .message.parsed
+        response: IGThreadAISummary = await parse_completion_async(
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are given an Instagram Thread that someone posted on a political topic. Write a summary of at most three sentences summarizing the thread. Denote political keywords (broad voter concerns) that the news thread mentions. If the thread doesn't mention any political keywords (e.g. only a call to vote), return an empty list or return unknown. Denote the political leaning of the thread. If the thread doesn't lean any particular direction, return unknown. Denote one or more tones present in the thread. If the thread doesn't have a clear tone, return unknown. Compile a list of issues that contains more specific issues discussed by the article.",
+                },
+                {"role": "user", "content": ig_thread.text},
+            ],
+            response_format=IGThreadAISummary,
         )
 
         response.political_keywords = list(
@@ -59,13 +47,7 @@ def process_ig_thread(ig_thread: RawIGThread) -> EnhancedIGThread:
             filter(lambda item: item != "Unknown", response.political_tones)
         )
 
-        summary_embedding: list[float] = (
-            openai.embeddings.create(
-                input=response.ai_summary, model="text-embedding-3-small"
-            )
-            .data[0]
-            .embedding
-        )
+        summary_embedding: list[float] = await embed_text_async(response.ai_summary)
 
         return EnhancedIGThread(
             **dict(ig_thread),
@@ -100,7 +82,7 @@ def get_ig_threads() -> list[RawIGThread]:
     return ig_threads
 
 
-if __name__ == "__main__":
+async def main():
     raw_ig_threads = get_ig_threads()
 
     with tqdm(total=len(raw_ig_threads), desc="Processing IG threads") as pbar:
@@ -113,11 +95,10 @@ if __name__ == "__main__":
                 ).execute()
             pbar.update(1)
 
-        with Pool(cpu_count()) as pool:
-            for thread in raw_ig_threads:
-                pool.apply_async(process_ig_thread, args=(thread,), callback=update)
-
-            pool.close()
-            pool.join()
+        await run_bounded(process_ig_thread, raw_ig_threads, update)
 
     print("All content processed successfully")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
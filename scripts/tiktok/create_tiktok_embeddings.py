@@ -1,12 +1,14 @@
+import asyncio
 import os
 import supabase
 from dotenv import load_dotenv
 from postgrest.base_request_builder import SingleAPIResponse
 from models import TikTokVideoData, TikTokAISummaries, TikTokVideoDataWithEmbeddings
-from openai.types.chat import ParsedChatCompletion
-import openai
 from tqdm import tqdm
-import multiprocessing as mp
+
+from scripts.helpers.async_openai import run_bounded
+from scripts.helpers.completion_cache import parse_completion_async
+from scripts.helpers.embeddings import embed_texts_async
 
 
 load_dotenv(".env.local")
@@ -26,8 +28,10 @@ def get_tiktok_data() -> list[TikTokVideoData]:
     return data
 
 
-def create_tiktok_embeddings(tiktok: TikTokVideoData) -> TikTokVideoDataWithEmbeddings:
-    response: ParsedChatCompletion = openai.beta.chat.completions.parse(
+async def create_tiktok_embeddings(
+    tiktok: TikTokVideoData,
+) -> TikTokVideoDataWithEmbeddings:
+    tiktok_ai_summaries: TikTokAISummaries = await parse_completion_async(
         model="gpt-4o-mini",
         response_format=TikTokAISummaries,
         messages=[
@@ -43,24 +47,10 @@ def create_tiktok_embeddings(tiktok: TikTokVideoData) -> TikTokVideoDataWithEmbe
             },
         ],
     )
-    tiktok_ai_summaries: TikTokAISummaries = response.choices[0].message.parsed
-
-    caption_embedding: list[float] | None = (
-        openai.embeddings.create(input=tiktok.caption, model="text-embedding-3-small")
-        .data[0]
-        .embedding
-        if tiktok.caption
-        else None
-    )
 
-    summary_embedding: list[float] | None = (
-        openai.embeddings.create(
-            input=tiktok_ai_summaries.summary, model="text-embedding-3-small"
-        )
-        .data[0]
-        .embedding
-        if tiktok_ai_summaries.summary
-        else None
+    # Blank captions or summaries come back as None
+    caption_embedding, summary_embedding = await embed_texts_async(
+        [tiktok.caption, tiktok_ai_summaries.summary]
     )
 
     tiktok_embeddings = TikTokVideoDataWithEmbeddings(
@@ -72,7 +62,7 @@ def create_tiktok_embeddings(tiktok: TikTokVideoData) -> TikTokVideoDataWithEmbe
     return tiktok_embeddings
 
 
-if __name__ == "__main__":
+async def main():
     tiktok_data = get_tiktok_data()
     supabase_client = get_supabase_client()
     with tqdm(total=len(tiktok_data), desc="Processing TikTok videos") as pbar:
@@ -84,14 +74,10 @@ if __name__ == "__main__":
                 ).execute()
             pbar.update(1)
 
-        with mp.Pool(mp.cpu_count()) as p:
-            for tiktok in tiktok_data:
-                embeddings: TikTokVideoDataWithEmbeddings = create_tiktok_embeddings(
-                    tiktok
-                )
-                p.apply_async(create_tiktok_embeddings, args=(tiktok,), callback=update)
-
-            p.close()
-            p.join()
+        await run_bounded(create_tiktok_embeddings, tiktok_data, update)
 
     print("All video finished processing")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,15 @@
 import os
+import sys
 from dotenv import load_dotenv
 from supabase import create_client, Client
 import openai
 from multiprocessing import Pool, cpu_count
 from tqdm import tqdm
 
+# Run directly as a file, so make the repository root importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from scripts.helpers.embeddings import embed_texts
+
 print("Starting TikTok embeddings generation script...")
 
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '..', '.env.local'))
@@ -47,7 +52,7 @@ def get_tiktok_data():
 
 def generate_embedding(text):
     print(f"Generating embedding for text: {text[:50]}...")
-    return openai.embeddings.create(input=text, model="text-embedding-3-small").data[0].embedding
+    return embed_texts([text])[0]
 
 def process_item(item):
     author = item.get("author", "")
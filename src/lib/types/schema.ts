@@ -344,10 +344,50 @@ export type Database = {
         }
         Relationships: []
       }
+      frame_extraction_progress: {
+        Row: {
+          completed: boolean
+          last_frame_number: number | null
+          last_timestamp: string | null
+          updated_at: string
+          video_id: string
+          video_uuid: string
+        }
+        Insert: {
+          completed?: boolean
+          last_frame_number?: number | null
+          last_timestamp?: string | null
+          updated_at?: string
+          video_id: string
+          video_uuid: string
+        }
+        Update: {
+          completed?: boolean
+          last_frame_number?: number | null
+          last_timestamp?: string | null
+          updated_at?: string
+          video_id?: string
+          video_uuid?: string
+        }
+        Relationships: [
+          {
+            foreignKeyName: "frame_extraction_progress_video_uuid_fkey"
+            columns: ["video_uuid"]
+            isOneToOne: true
+            referencedRelation: "youtube"
+            referencedColumns: ["id"]
+          },
+        ]
+      }
       frames_records: {
         Row: {
           created_at: string
           embedding: string | null
+          embedding_half: string | null
+          embedding_int8: string | null
+          embedding_model: string | null
+          embedding_scale: number | null
+          end_timestamp: string | null
           frame_number: string | null
           id: string
           storage_path: string | null
@@ -358,6 +398,11 @@ export type Database = {
         Insert: {
           created_at?: string
           embedding?: string | null
+          embedding_half?: string | null
+          embedding_int8?: string | null
+          embedding_model?: string | null
+          embedding_scale?: number | null
+          end_timestamp?: string | null
           frame_number?: string | null
           id?: string
           storage_path?: string | null
@@ -368,6 +413,11 @@ export type Database = {
         Update: {
           created_at?: string
           embedding?: string | null
+          embedding_half?: string | null
+          embedding_int8?: string | null
+          embedding_model?: string | null
+          embedding_scale?: number | null
+          end_timestamp?: string | null
           frame_number?: string | null
           id?: string
           storage_path?: string | null
@@ -390,6 +440,7 @@ export type Database = {
           created_at: string
           duration: string
           embedding: string | null
+          granularity: string
           id: string
           soundbytes: string[]
           text: string | null
@@ -401,6 +452,7 @@ export type Database = {
           created_at?: string
           duration?: string
           embedding?: string | null
+          granularity?: string
           id?: string
           soundbytes?: string[]
           text?: string | null
@@ -412,6 +464,7 @@ export type Database = {
           created_at?: string
           duration?: string
           embedding?: string | null
+          granularity?: string
           id?: string
           soundbytes?: string[]
           text?: string | null
@@ -1304,6 +1357,7 @@ export type Database = {
       }
       video_embeddings: {
         Row: {
+          content_hash: string | null
           duration: string
           embedding: string | null
           id: string
@@ -1313,6 +1367,7 @@ export type Database = {
           video_uuid: string | null
         }
         Insert: {
+          content_hash?: string | null
           duration?: string
           embedding?: string | null
           id?: string
@@ -1322,6 +1377,7 @@ export type Database = {
           video_uuid?: string | null
         }
         Update: {
+          content_hash?: string | null
           duration?: string
           embedding?: string | null
           id?: string
@@ -1425,6 +1481,18 @@ export type Database = {
           soundbytes: Json[]
         }[]
       }
+      get_grouped_video_embeddings_page: {
+        Args: {
+          after_video_uuid?: string
+          page_size?: number
+          include_embeddings?: boolean
+          max_soundbytes?: number
+        }
+        Returns: {
+          video_uuid: string
+          soundbytes: Json[]
+        }[]
+      }
       get_latest_unique_youtube_videos: {
         Args: Record<PropertyKey, never>
         Returns: {
@@ -1607,6 +1675,23 @@ export type Database = {
           similarity: number
         }[]
       }
+      match_grouped_video_embeddings: {
+        Args: {
+          query_embedding: string
+          match_count: number
+          match_granularity: string
+          video_uuids?: string[]
+        }
+        Returns: {
+          id: string
+          video_uuid: string
+          granularity: string
+          timestamp: string
+          duration: string
+          text: string
+          similarity: number
+        }[]
+      }
       search_ads_advanced:
         | {
             Args: {
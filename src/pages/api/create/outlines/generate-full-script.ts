@@ -11,7 +11,8 @@ async function fetchGroupedVideoEmbeddings(element: any) {
     const { data: videoEmbeddingsObjects, error } = await supabase
         .from("grouped_video_embeddings")
         .select("*")
-        .eq("video_uuid", element.video_uuid);
+        .eq("video_uuid", element.video_uuid)
+        .eq("granularity", "sentence");
 
     if (error) throw error;
 
@@ -31,7 +31,8 @@ export default async function handler(req: NextApiRequest, res: NextApiResponse)
       const { data: videoEmbeddingsObjects, error } = await supabase
         .from("grouped_video_embeddings")
         .select("*")
-        .eq("video_uuid", element.video_uuid);
+        .eq("video_uuid", element.video_uuid)
+        .eq("granularity", "sentence");
     
       if (error) throw error;
 
@@ -0,0 +1,2 @@
+ALTER TABLE frames_records
+ADD COLUMN end_timestamp TIMESTAMPTZ;
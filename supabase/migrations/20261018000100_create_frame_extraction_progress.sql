@@ -0,0 +1,8 @@
+CREATE TABLE frame_extraction_progress (
+    video_uuid UUID PRIMARY KEY REFERENCES youtube(id) ON DELETE CASCADE,
+    video_id TEXT NOT NULL,
+    last_frame_number INTEGER,
+    last_timestamp TIMESTAMPTZ,
+    completed BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,5 @@
+ALTER TABLE frames_records
+ADD COLUMN embedding_model TEXT,
+ADD COLUMN embedding_half halfvec,
+ADD COLUMN embedding_int8 BYTEA,
+ADD COLUMN embedding_scale REAL;
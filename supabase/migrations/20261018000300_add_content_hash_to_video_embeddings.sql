@@ -0,0 +1,4 @@
+ALTER TABLE video_embeddings
+ADD COLUMN content_hash TEXT;
+
+CREATE INDEX video_embeddings_video_uuid_idx ON video_embeddings (video_uuid);
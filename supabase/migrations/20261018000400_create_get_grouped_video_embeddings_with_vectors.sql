@@ -0,0 +1,21 @@
+CREATE OR REPLACE FUNCTION public.get_grouped_video_embeddings_with_vectors()
+ RETURNS TABLE(video_uuid uuid, soundbytes json[])
+ LANGUAGE sql
+AS $function$
+  SELECT
+    video_uuid,
+    array_agg(
+      json_build_object(
+        'id', id,
+        'timestamp', timestamp,
+        'duration', duration,
+        'text', text,
+        'video_id', video_id,
+        'embedding', embedding
+      )
+      ORDER BY timestamp
+    ) as soundbytes
+  FROM video_embeddings
+  GROUP BY 1;
+$function$
+;
@@ -0,0 +1,48 @@
+CREATE OR REPLACE FUNCTION public.get_grouped_video_embeddings_page(
+  after_video_uuid uuid DEFAULT NULL,
+  page_size integer DEFAULT 100,
+  include_embeddings boolean DEFAULT FALSE
+)
+ RETURNS TABLE(video_uuid uuid, soundbytes json[])
+ LANGUAGE sql
+AS $function$
+  WITH page AS (
+    SELECT DISTINCT ve.video_uuid
+    FROM video_embeddings ve
+    WHERE after_video_uuid IS NULL OR ve.video_uuid > after_video_uuid
+    ORDER BY ve.video_uuid
+    LIMIT page_size
+  )
+  SELECT
+    ve.video_uuid,
+    array_agg(
+      CASE
+        WHEN include_embeddings THEN json_build_object(
+          'id', ve.id,
+          'timestamp', ve.timestamp,
+          'duration', ve.duration,
+          'text', ve.text,
+          'video_id', ve.video_id,
+          'embedding', ve.embedding
+        )
+        ELSE json_build_object(
+          'id', ve.id,
+          'timestamp', ve.timestamp,
+          'duration', ve.duration,
+          'text', ve.text,
+          'video_id', ve.video_id
+        )
+      END
+      ORDER BY ve.timestamp
+    ) as soundbytes
+  FROM video_embeddings ve
+  JOIN page ON page.video_uuid = ve.video_uuid
+  GROUP BY 1
+  ORDER BY 1;
+$function$
+;
+
+CREATE INDEX IF NOT EXISTS grouped_video_embeddings_video_uuid_idx ON grouped_video_embeddings (video_uuid);
+
+-- Superseded by the paged function above
+DROP FUNCTION IF EXISTS public.get_grouped_video_embeddings_with_vectors();
@@ -0,0 +1,114 @@
+-- Existing rows are the 10-60s sentence-bounded blocks
+ALTER TABLE grouped_video_embeddings
+ADD COLUMN granularity TEXT NOT NULL DEFAULT 'sentence';
+
+CREATE INDEX grouped_video_embeddings_granularity_video_uuid_idx ON grouped_video_embeddings (granularity, video_uuid);
+
+-- Soundbyte offsets as plain seconds, so the segmenter never parses timestamps
+CREATE OR REPLACE FUNCTION public.get_grouped_video_embeddings_page(
+  after_video_uuid uuid DEFAULT NULL,
+  page_size integer DEFAULT 100,
+  include_embeddings boolean DEFAULT FALSE
+)
+ RETURNS TABLE(video_uuid uuid, soundbytes json[])
+ LANGUAGE sql
+AS $function$
+  WITH page AS (
+    SELECT DISTINCT ve.video_uuid
+    FROM video_embeddings ve
+    WHERE after_video_uuid IS NULL OR ve.video_uuid > after_video_uuid
+    ORDER BY ve.video_uuid
+    LIMIT page_size
+  )
+  SELECT
+    ve.video_uuid,
+    array_agg(
+      CASE
+        WHEN include_embeddings THEN json_build_object(
+          'id', ve.id,
+          'start_seconds', EXTRACT(EPOCH FROM ve.timestamp),
+          'duration_seconds', EXTRACT(EPOCH FROM ve.duration),
+          'text', ve.text,
+          'video_id', ve.video_id,
+          'embedding', ve.embedding
+        )
+        ELSE json_build_object(
+          'id', ve.id,
+          'start_seconds', EXTRACT(EPOCH FROM ve.timestamp),
+          'duration_seconds', EXTRACT(EPOCH FROM ve.duration),
+          'text', ve.text,
+          'video_id', ve.video_id
+        )
+      END
+      ORDER BY ve.timestamp
+    ) as soundbytes
+  FROM video_embeddings ve
+  JOIN page ON page.video_uuid = ve.video_uuid
+  GROUP BY 1
+  ORDER BY 1;
+$function$
+;
+
+-- Random clips keep drawing from the sentence-bounded blocks only
+CREATE OR REPLACE FUNCTION fetch_random_clips_grouped_ve()
+RETURNS TABLE (
+  video_uuid uuid,
+  video_id text,
+  title text,
+  description text,
+  start_timestamp timestamptz,
+  end_timestamp timestamptz,
+  text text
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    gve.video_uuid,
+    yt.video_id,
+    yt.title,
+    yt.description,
+    gve.timestamp AS start_timestamp,
+    gve.timestamp + make_interval(secs => EXTRACT(EPOCH FROM gve.duration)) AS end_timestamp,
+    gve.text
+  FROM grouped_video_embeddings gve
+  JOIN youtube yt ON gve.video_uuid = yt.id
+  WHERE gve.granularity = 'sentence'
+  ORDER BY random()
+  LIMIT 20;
+END;
+$$;
+
+-- Search one granularity, optionally within videos found at a coarser one
+CREATE OR REPLACE FUNCTION match_grouped_video_embeddings(
+  query_embedding vector(1536),
+  match_count int,
+  match_granularity text,
+  video_uuids uuid[] DEFAULT NULL
+)
+RETURNS TABLE (
+  id uuid,
+  video_uuid uuid,
+  granularity text,
+  "timestamp" timestamptz,
+  duration timestamptz,
+  text text,
+  similarity float
+)
+LANGUAGE sql
+AS $$
+  SELECT
+    gve.id,
+    gve.video_uuid,
+    gve.granularity,
+    gve.timestamp,
+    gve.duration,
+    gve.text,
+    1 - (gve.embedding <=> query_embedding) AS similarity
+  FROM grouped_video_embeddings gve
+  WHERE gve.granularity = match_granularity
+    AND (video_uuids IS NULL OR gve.video_uuid = ANY (video_uuids))
+  ORDER BY gve.embedding <=> query_embedding
+  LIMIT match_count;
+$$;
@@ -0,0 +1,9 @@
+-- Writers upsert on this key, so a retried batch can't duplicate soundbytes
+DELETE FROM video_embeddings AS duplicate
+USING video_embeddings AS kept
+WHERE duplicate.video_uuid = kept.video_uuid
+  AND duplicate.content_hash = kept.content_hash
+  AND duplicate.ctid > kept.ctid;
+
+ALTER TABLE video_embeddings
+ADD CONSTRAINT video_embeddings_video_uuid_content_hash_key UNIQUE (video_uuid, content_hash);
@@ -0,0 +1,60 @@
+-- Pages that carry embeddings are bounded by soundbytes, not just videos:
+-- each vector is ~20 KB of JSON, so a page of long videos ran to gigabytes
+DROP FUNCTION IF EXISTS public.get_grouped_video_embeddings_page(uuid, integer, boolean);
+
+CREATE OR REPLACE FUNCTION public.get_grouped_video_embeddings_page(
+  after_video_uuid uuid DEFAULT NULL,
+  page_size integer DEFAULT 100,
+  include_embeddings boolean DEFAULT FALSE,
+  max_soundbytes integer DEFAULT NULL
+)
+ RETURNS TABLE(video_uuid uuid, soundbytes json[])
+ LANGUAGE sql
+AS $function$
+  WITH counts AS (
+    SELECT ve.video_uuid, COUNT(*) AS soundbyte_count
+    FROM video_embeddings ve
+    WHERE after_video_uuid IS NULL OR ve.video_uuid > after_video_uuid
+    GROUP BY ve.video_uuid
+    ORDER BY ve.video_uuid
+    LIMIT page_size
+  ),
+  page AS (
+    -- The first video is always included, however long it is
+    SELECT running.video_uuid
+    FROM (
+      SELECT
+        counts.video_uuid,
+        SUM(counts.soundbyte_count) OVER (ORDER BY counts.video_uuid) - counts.soundbyte_count AS soundbytes_before
+      FROM counts
+    ) running
+    WHERE max_soundbytes IS NULL OR running.soundbytes_before < max_soundbytes
+  )
+  SELECT
+    ve.video_uuid,
+    array_agg(
+      CASE
+        WHEN include_embeddings THEN json_build_object(
+          'id', ve.id,
+          'start_seconds', EXTRACT(EPOCH FROM ve.timestamp),
+          'duration_seconds', EXTRACT(EPOCH FROM ve.duration),
+          'text', ve.text,
+          'video_id', ve.video_id,
+          'embedding', ve.embedding
+        )
+        ELSE json_build_object(
+          'id', ve.id,
+          'start_seconds', EXTRACT(EPOCH FROM ve.timestamp),
+          'duration_seconds', EXTRACT(EPOCH FROM ve.duration),
+          'text', ve.text,
+          'video_id', ve.video_id
+        )
+      END
+      ORDER BY ve.timestamp
+    ) as soundbytes
+  FROM video_embeddings ve
+  JOIN page ON page.video_uuid = ve.video_uuid
+  GROUP BY 1
+  ORDER BY 1;
+$function$
+;